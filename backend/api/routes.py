@@ -1,13 +1,59 @@
-from flask import Blueprint, jsonify, request, after_this_request
+from flask import (Blueprint, Response, g, jsonify, request, after_this_request,
+                   stream_with_context)
+import atexit
+import json
 import os
+from datetime import datetime, timezone
 from functools import wraps
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
-from database.database import Message, SessionLocal
-from models.bert_model import analyze_message as analyze_bert
-from models.bilstm_model import analyze_message as analyze_bilstm
-from models.xgboost_model import analyze_message as analyze_xgboost
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from database.database import (Message, SessionLocal, content_hash,
+                               missing_results)
+from database.jobs import enqueue_jobs, format_job, get_job
+from database.messages import (LABEL_COLUMNS, MESSAGE_ORDERS, InvalidCursor,
+                               page_messages, stream_messages, verify_messages)
+from database.writer import WriteBehindWriter
+from models import loader as model_loader
+from models import registry as model_registry
+from utils.artifacts import artifact_mtime
+from utils import long_input, metrics
+from utils.batcher import MicroBatcher
+from utils.bucketing import all_padding_stats
+from utils.cache import InferenceCache, content_key
+from utils.config import (ANALYSIS_MODE, ANALYZE_BATCH_MAX_SIZE,
+                          ASYNC_MAX_MESSAGES, BERT_BATCH_MAX_SIZE,
+                          BERT_BATCH_WAIT_MS, BERT_ENGINE, BERT_TIMEOUT_S,
+                          BERT_WORKERS, BILSTM_BATCH_MAX_SIZE,
+                          BILSTM_BATCH_WAIT_MS, BILSTM_ENGINE, BILSTM_TIMEOUT_S,
+                          BILSTM_WORKERS, JOB_BATCH_SIZE, JOB_LEASE_S,
+                          JOB_MAX_ATTEMPTS, JOB_POLL_INTERVAL_S, JOB_WORKERS,
+                          LONG_INPUT_MAX_CHARS,
+                          MESSAGES_MAX_PAGE_SIZE, MESSAGES_PAGE_SIZE,
+                          MESSAGES_STREAM_BATCH_SIZE, MICRO_BATCHING,
+                          MODEL_QUEUE_SIZE, MODEL_REGISTRY_POLL_S,
+                          PARALLEL_INFERENCE,
+                          PERSISTENCE_MODE, RATELIMIT_ENABLED,
+                          RATELIMIT_STORAGE_URI,
+                          RESULT_CACHE_SIZE,
+                          RESULT_CACHE_TTL_S, RESULT_CACHE_WARM,
+                          RESULT_CACHE_WARM_LIMIT, TIER_HIGH,
+                          TIER_LOW, TIER_MODELS, VERIFY_MAX_MESSAGES,
+                          WRITE_BEHIND_BATCH_SIZE,
+                          WRITE_BEHIND_FLUSH_INTERVAL_S,
+                          WRITE_BEHIND_QUEUE_SIZE,
+                          WRITE_BEHIND_RETRIES,
+                          WRITE_BEHIND_RETRY_DELAY_S,
+                          XGBOOST_BATCH_MAX_SIZE, XGBOOST_BATCH_WAIT_MS,
+                          XGBOOST_TIMEOUT_S,
+                          XGBOOST_WORKERS)
+from utils.job_workers import JobWorkerPool
+from utils.parallel import ParallelModelRunner
+from utils.profiling import RequestProfiler
+from utils.tiering import is_uncertain
 
 api_blueprint = Blueprint('api', __name__)
 
@@ -15,27 +61,204 @@ api_blueprint = Blueprint('api', __name__)
 limiter = Limiter(
     key_func=get_remote_address,
     default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
+    storage_uri=RATELIMIT_STORAGE_URI,
+    enabled=RATELIMIT_ENABLED
 )
 
+MODEL_NAMES = ('BERT', 'BiLSTM', 'XGBoost')
+ANALYSIS_MODES = ('full', 'tiered')
+# The same model version gives different confidences under another engine,
+# so stored rows record these and the result cache only reuses matching ones.
+# The fast XGBoost path matches the reference one, so it is not included.
+ENGINES = f"BERT={BERT_ENGINE},BiLSTM={BILSTM_ENGINE}"
+# BERT is the model the tiers decide whether to run
+if not TIER_MODELS or any(name not in MODEL_NAMES[1:] for name in TIER_MODELS):
+    raise ValueError(f"TIER_MODELS must list one or more of {', '.join(MODEL_NAMES[1:])}")
+
+
+def model_analyze_fn(name):
+    def analyze_message(message):
+        model = model_loader.get_model(name)
+        inputs = long_input.model_inputs(message)
+        with metrics.time_model(name, "total"):
+            if len(inputs) == 1:
+                return model.analyze_message(inputs[0])
+            # Chunks of a long message go to the model as one batch
+            return long_input.aggregate(model.analyze_messages(inputs))
+    return analyze_message
+
+
+def model_batch_fn(name):
+    def analyze_messages(messages):
+        model = model_loader.get_model(name)
+        with metrics.time_model(name, "total"):
+            return long_input.analyze_long_messages(model.analyze_messages, messages)
+    return analyze_messages
+
+
+# Per-message and batched entry points for each model. Models are resolved
+# through the loader on every call, so they can load after the app starts.
+analyze_fns = {name: model_analyze_fn(name) for name in MODEL_NAMES}
+analyze_batch_fns = {name: model_batch_fn(name) for name in MODEL_NAMES}
+
+# Micro-batchers coalesce concurrent /analyze calls into one model call each.
+# They are drop-in replacements for the per-message analyze functions.
+batchers = {}
+if MICRO_BATCHING:
+    batch_settings = {
+        'BERT': (BERT_BATCH_MAX_SIZE, BERT_BATCH_WAIT_MS),
+        'BiLSTM': (BILSTM_BATCH_MAX_SIZE, BILSTM_BATCH_WAIT_MS),
+        'XGBoost': (XGBOOST_BATCH_MAX_SIZE, XGBOOST_BATCH_WAIT_MS),
+    }
+    batchers = {
+        name: MicroBatcher(name, analyze_batch_fns[name], *batch_settings[name])
+        for name in MODEL_NAMES
+    }
+    analyze_fns.update(batchers)
+
+# In parallel mode each model gets its own bounded executor and timeout, so
+# request latency is the slowest model rather than the sum of all three.
+parallel_runner = None
+if PARALLEL_INFERENCE:
+    parallel_runner = ParallelModelRunner({
+        'BERT': (analyze_fns['BERT'], BERT_WORKERS, BERT_TIMEOUT_S),
+        'BiLSTM': (analyze_fns['BiLSTM'], BILSTM_WORKERS, BILSTM_TIMEOUT_S),
+        'XGBoost': (analyze_fns['XGBoost'], XGBOOST_WORKERS, XGBOOST_TIMEOUT_S),
+    }, max_pending=MODEL_QUEUE_SIZE)
+
+# Results are cached per message and per set of loaded model versions, so a
+# retrained model never serves answers computed by its predecessor.
+result_cache = None
+if RESULT_CACHE_SIZE > 0:
+    result_cache = InferenceCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL_S)
+
+# Write-behind persistence takes the database off the request's critical
+# path; buffered rows are flushed on shutdown.
+db_writer = None
+if PERSISTENCE_MODE == "write_behind":
+    db_writer = WriteBehindWriter(WRITE_BEHIND_QUEUE_SIZE, WRITE_BEHIND_BATCH_SIZE,
+                                  WRITE_BEHIND_FLUSH_INTERVAL_S, WRITE_BEHIND_RETRIES,
+                                  WRITE_BEHIND_RETRY_DELAY_S)
+
+
+def model_versions():
+    # None while any model is still loading; the cache is bypassed until then
+    versions = [model_loader.loaded_version(name) for name in MODEL_NAMES]
+    if None in versions:
+        return None
+    return ":".join(versions)
+
+
+def initialize_models():
+    """Load and warm up every model, then warm the result cache."""
+    if model_loader.load_all() and result_cache is not None and RESULT_CACHE_WARM:
+        warm_result_cache()
+
+
+def admin_key_error():
+    """Error response if the request lacks the admin key, else None."""
+    api_key = os.getenv("ADMIN_API_KEY")
+    if not api_key:
+        return jsonify({"error": "Server admin key not configured"}), 500
+    header_key = request.headers.get("X-API-KEY") or (request.headers.get("Authorization") or "").replace("Bearer ", "")
+    if header_key != api_key:
+        return jsonify({"error": "Unauthorized"}), 401
+    return None
+
 
 def require_api_key(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        api_key = os.getenv("ADMIN_API_KEY")
-        if not api_key:
-            return jsonify({"error": "Server admin key not configured"}), 500
-        header_key = request.headers.get("X-API-KEY") or (request.headers.get("Authorization") or "").replace("Bearer ", "")
-        if header_key != api_key:
-            return jsonify({"error": "Unauthorized"}), 401
+        error = admin_key_error()
+        if error is not None:
+            return error
         return f(*args, **kwargs)
     return decorated
 
 
-def analyze_with_models(message):
-    bert_result = analyze_bert(message)
-    bilstm_result = analyze_bilstm(message)
-    xgboost_result = analyze_xgboost(message)
+# "X-Debug: timing" adds a per-stage timing breakdown to the response and
+# "X-Debug: profile" returns a sampling profile of the request instead.
+# Both need the admin key.
+DEBUG_MODES = ('timing', 'profile')
+
+
+@api_blueprint.before_request
+def start_debug_capture():
+    mode = request.headers.get('X-Debug')
+    if not mode:
+        return None
+    if mode not in DEBUG_MODES:
+        return jsonify({'error': f'X-Debug must be one of {", ".join(DEBUG_MODES)}'}), 400
+    error = admin_key_error()
+    if error is not None:
+        return error
+    if mode == 'timing':
+        g.debug_timing, g.debug_timing_token = metrics.start_request_timing()
+        return None
+    try:
+        profiler = RequestProfiler()
+    except ImportError:
+        return jsonify({'error': 'Profiling needs the pyinstrument package'}), 501
+    profiler.start()
+    g.debug_profiler = profiler
+    return None
+
+
+@api_blueprint.after_request
+def finish_debug_capture(response):
+    timing = g.get('debug_timing')
+    if timing is not None:
+        response.headers['Server-Timing'] = timing.server_timing()
+        if response.is_json and not response.is_streamed:
+            data = response.get_json()
+            if isinstance(data, dict):
+                data['timing'] = timing.summary()
+                response.set_data(json.dumps(data))
+    profiler = g.pop('debug_profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        response = Response(profiler.html(), mimetype='text/html')
+        response.headers['Content-Disposition'] = 'attachment; filename="profile.html"'
+    return response
+
+
+@api_blueprint.teardown_request
+def stop_debug_capture(exc):
+    # Also runs when the view raised, so the next request on this thread
+    # does not inherit the timing context or a running profiler
+    if g.pop('debug_timing', None) is not None:
+        metrics.stop_request_timing(g.pop('debug_timing_token'))
+    profiler = g.pop('debug_profiler', None)
+    if profiler is not None:
+        profiler.stop()
+
+
+def analyze_with_models(message, mode=None):
+    mode = mode or ANALYSIS_MODE
+    key = None
+    versions = model_versions() if result_cache is not None else None
+    if versions is not None:
+        key = content_key(message, f"{versions}:{mode}:{long_input.POLICY_KEY}")
+        cached = result_cache.get(key)
+        if cached is not None:
+            return dict(cached)
+
+    if mode == 'tiered':
+        analysis_results = run_models_tiered(message)
+    else:
+        analysis_results = run_models(message)
+    if key is not None and is_complete(analysis_results):
+        result_cache.put(key, analysis_results)
+    return analysis_results
+
+
+def run_models(message):
+    if parallel_runner is not None:
+        return analyze_with_models_parallel(message)
+
+    bert_result = analyze_fns['BERT'](message)
+    bilstm_result = analyze_fns['BiLSTM'](message)
+    xgboost_result = analyze_fns['XGBoost'](message)
     print("Analyzing message:", message)
     print("BERT Result:", bert_result)
     print("BiLSTM Result:", bilstm_result)
@@ -48,33 +271,197 @@ def analyze_with_models(message):
     }
 
 
-def save_analysis_to_db(message, analysis_results):
+def analyze_with_models_parallel(message):
+    # Models that fail or time out come back as None (partial results)
+    analysis_results, errors = parallel_runner.run(message)
+    print("Analyzing message:", message)
+    for model, result in analysis_results.items():
+        print(f"{model} Result:", result if result is not None else errors[model])
+    return analysis_results
+
+
+def run_models_tiered(message):
+    # Cheap tiers first; BERT only runs when they are uncertain. The keys of
+    # the result tell which tiers ran.
+    analysis_results = {name: analyze_fns[name](message) for name in TIER_MODELS}
+    if is_uncertain(analysis_results.values(), TIER_LOW, TIER_HIGH):
+        analysis_results['BERT'] = analyze_fns['BERT'](message)
+    print("Analyzing message (tiered):", message)
+    for model, result in analysis_results.items():
+        print(f"{model} Result:", result)
+    return analysis_results
+
+
+def is_complete(analysis_results):
+    return all(result is not None for result in analysis_results.values())
+
+
+def analyze_batch_with_models(messages, mode=None):
+    mode = mode or ANALYSIS_MODE
+    batch_results = [None] * len(messages)
+    keys = [None] * len(messages)
+    pending = []
+    versions = model_versions() if result_cache is not None else None
+    for i, message in enumerate(messages):
+        if versions is not None:
+            keys[i] = content_key(message, f"{versions}:{mode}:{long_input.POLICY_KEY}")
+            cached = result_cache.get(keys[i])
+            if cached is not None:
+                batch_results[i] = dict(cached)
+                continue
+        pending.append(i)
+
+    if pending:
+        pending_messages = [messages[i] for i in pending]
+        if mode == 'tiered':
+            computed = run_models_batch_tiered(pending_messages)
+        else:
+            computed = run_models_batch(pending_messages)
+        for i, analysis_results in zip(pending, computed):
+            batch_results[i] = analysis_results
+            if keys[i] is not None:
+                result_cache.put(keys[i], analysis_results)
+    return batch_results
+
+
+def run_models_batch(messages):
+    # One vectorized call per model for the whole batch
+    bert_results = analyze_batch_fns['BERT'](messages)
+    bilstm_results = analyze_batch_fns['BiLSTM'](messages)
+    xgboost_results = analyze_batch_fns['XGBoost'](messages)
+    print(f"Analyzed batch of {len(messages)} messages")
+
+    return [
+        {
+            'BERT': bert_result,
+            'BiLSTM': bilstm_result,
+            'XGBoost': xgboost_result,
+        }
+        for bert_result, bilstm_result, xgboost_result
+        in zip(bert_results, bilstm_results, xgboost_results)
+    ]
+
+
+def run_models_batch_tiered(messages):
+    tier_results = {name: analyze_batch_fns[name](messages) for name in TIER_MODELS}
+    batch_results = [
+        {name: tier_results[name][i] for name in TIER_MODELS}
+        for i in range(len(messages))
+    ]
+    uncertain = [i for i, analysis_results in enumerate(batch_results)
+                 if is_uncertain(analysis_results.values(), TIER_LOW, TIER_HIGH)]
+    if uncertain:
+        bert_results = analyze_batch_fns['BERT']([messages[i] for i in uncertain])
+        for i, bert_result in zip(uncertain, bert_results):
+            batch_results[i]['BERT'] = bert_result
+    print(f"Analyzed batch of {len(messages)} messages (tiered), "
+          f"BERT ran on {len(uncertain)}")
+    return batch_results
+
+
+def warm_result_cache():
+    # Stored analyses are only valid for the models that produced them, so
+    # only rows written after the newest artifact change, under the current
+    # engines, are reused. Rows do not record the long-input policy they were
+    # analyzed under, so only messages short enough for no policy to apply
+    # are reused.
+    since = artifact_mtime(*(
+        path for name in MODEL_NAMES
+        for key, path in model_loader.artifact_paths(name).items()
+        if key not in model_registry.DERIVED_ARTIFACTS))
+    versions = model_versions()
     db = SessionLocal()
     try:
-        existing_message = db.query(Message).filter(
-            Message.content == message).first()
-        if existing_message:
-            return existing_message  # Return the existing message if it's a duplicate
-
-        db_message = Message(
-            content=message,
-            bert_label=analysis_results['BERT'][0],
-            bert_confidence=analysis_results['BERT'][1],
-            bilstm_label=analysis_results['BiLSTM'][0],
-            bilstm_confidence=analysis_results['BiLSTM'][1],
-            xgboost_label=analysis_results['XGBoost'][0],
-            xgboost_confidence=analysis_results['XGBoost'][1],
-            verified=False,
-            used_for_training=False
-        )
-        db.add(db_message)
-        db.commit()
-        db.refresh(db_message)
-        return db_message
+        query = db.query(Message).filter(
+            Message.bert_confidence.isnot(None),
+            Message.bilstm_confidence.isnot(None),
+            Message.xgboost_confidence.isnot(None),
+            func.length(Message.content) <= LONG_INPUT_MAX_CHARS,
+            Message.engines == ENGINES)
+        if since is not None:
+            query = query.filter(Message.timestamp >= since)
+        rows = query.order_by(Message.id.desc()).limit(
+            RESULT_CACHE_WARM_LIMIT).all()
+        for row in reversed(rows):
+            result_cache.put(content_key(row.content, f"{versions}:full:{long_input.POLICY_KEY}"), {
+                'BERT': (int(row.bert_label), row.bert_confidence),
+                'BiLSTM': (int(row.bilstm_label), row.bilstm_confidence),
+                'XGBoost': (int(row.xgboost_label), row.xgboost_confidence),
+            })
+        print(f"Warmed result cache with {len(rows)} stored analyses")
     finally:
         db.close()
 
 
+def result_field(analysis_results, model, index):
+    # Models skipped by the tiered mode are stored as NULL
+    result = analysis_results.get(model)
+    return result[index] if result is not None else None
+
+
+def analysis_row(message, analysis_results, digest=None):
+    return {
+        'content': message,
+        'content_hash': digest or content_hash(message),
+        'bert_label': result_field(analysis_results, 'BERT', 0),
+        'bert_confidence': result_field(analysis_results, 'BERT', 1),
+        'bilstm_label': result_field(analysis_results, 'BiLSTM', 0),
+        'bilstm_confidence': result_field(analysis_results, 'BiLSTM', 1),
+        'xgboost_label': result_field(analysis_results, 'XGBoost', 0),
+        'xgboost_confidence': result_field(analysis_results, 'XGBoost', 1),
+        'timestamp': datetime.utcnow(),
+        'verified': False,
+        'used_for_training': False,
+        'engines': ENGINES,
+    }
+
+
+def save_analysis_to_db(message, analysis_results):
+    digest = content_hash(message)
+    with metrics.time_db("save"):
+        db = SessionLocal()
+        try:
+            with metrics.time_db("dedupe"):
+                existing_message = db.query(Message).filter(
+                    Message.content_hash == digest).first()
+            row = analysis_row(message, analysis_results, digest)
+            if existing_message:
+                # Return the existing message if it's a duplicate, with the
+                # results it lacks filled in from this analysis
+                missing = missing_results(existing_message, row)
+                if missing:
+                    for column, value in missing.items():
+                        setattr(existing_message, column, value)
+                    db.commit()
+                    db.refresh(existing_message)
+                return existing_message
+
+            db_message = Message(**row)
+            db.add(db_message)
+            try:
+                with metrics.time_db("commit"):
+                    db.commit()
+            except IntegrityError:
+                # A concurrent request stored the same text first
+                db.rollback()
+                return db.query(Message).filter(
+                    Message.content_hash == digest).first()
+            db.refresh(db_message)
+            return db_message
+        finally:
+            db.close()
+
+
+def persist_analysis(message, analysis_results):
+    """Store an analysis without waiting for the database when write-behind
+    persistence is enabled; falls back to a synchronous write when its
+    queue is full."""
+    with metrics.time_stage("persist"):
+        if db_writer is not None and db_writer.submit(analysis_row(message, analysis_results)):
+            return
+        save_analysis_to_db(message, analysis_results)
+
+
 def format_message(message):
     return {
         'id': message.id,
@@ -88,9 +475,46 @@ def format_message(message):
         'timestamp': message.timestamp.isoformat(),
         'verified': message.verified,
         'used_for_training': message.used_for_training,
+        'label': message.label,
     }
 
 
+def format_analysis(analysis_results, mode=None, message=None):
+    results = [
+        {'model': model, 'label': result[0], 'confidence': result[1]}
+        for model, result in analysis_results.items()
+        if result is not None
+    ]
+    best_result = max(results, key=lambda x: x['confidence'])
+    response = {'results': results, 'best': best_result}
+    failed = [model for model, result in analysis_results.items()
+              if result is None]
+    if failed:
+        response['failed'] = failed
+    if mode == 'tiered':
+        response['tiers'] = list(analysis_results)
+    if message is not None:
+        shortened = long_input.report(message)
+        if shortened:
+            response['long_input'] = shortened
+    return response
+
+
+def validate_messages(messages, max_size):
+    if not isinstance(messages, list) or not messages:
+        return 'No messages provided'
+    if len(messages) > max_size:
+        return f'At most {max_size} messages per request'
+    if not all(isinstance(message, str) and message for message in messages):
+        return 'Messages must be non-empty strings'
+    return None
+
+
+def get_analysis_mode(data):
+    mode = data.get('mode') or ANALYSIS_MODE
+    return mode if mode in ANALYSIS_MODES else None
+
+
 @api_blueprint.route('/analyze', methods=['POST'])
 @limiter.limit("10 per minute")
 def analyze():
@@ -99,25 +523,189 @@ def analyze():
 
     if not message:
         return jsonify({'error': 'No message provided'}), 400
+    mode = get_analysis_mode(data)
+    if mode is None:
+        return jsonify({'error': f'Mode must be one of {", ".join(ANALYSIS_MODES)}'}), 400
 
-    analysis_results = analyze_with_models(message)
-    results = [
-        {'model': model, 'label': result[0], 'confidence': result[1]}
-        for model, result in analysis_results.items()
-    ]
-    best_result = max(results, key=lambda x: x['confidence'])
-    save_analysis_to_db(message, analysis_results)
-    return jsonify({'results': results, 'best': best_result})
+    with metrics.time_stage("analyze"):
+        analysis_results = analyze_with_models(message, mode)
+    if not any(result is not None for result in analysis_results.values()):
+        return jsonify({'error': 'All models failed'}), 503
+    # Partial results are returned but not stored, so the table only ever
+    # holds rows that retraining can trust.
+    if is_complete(analysis_results):
+        persist_analysis(message, analysis_results)
+    with metrics.time_stage("serialize"):
+        return jsonify(format_analysis(analysis_results, mode, message))
+
+
+@api_blueprint.route('/analyze/batch', methods=['POST'])
+@limiter.limit("5 per minute")
+def analyze_batch():
+    data = request.get_json()
+    messages = data.get('messages')
+
+    error = validate_messages(messages, ANALYZE_BATCH_MAX_SIZE)
+    if error:
+        return jsonify({'error': error}), 400
+    mode = get_analysis_mode(data)
+    if mode is None:
+        return jsonify({'error': f'Mode must be one of {", ".join(ANALYSIS_MODES)}'}), 400
+
+    with metrics.time_stage("analyze_batch"):
+        batch_results = analyze_batch_with_models(messages, mode)
+    items = []
+    for message, analysis_results in zip(messages, batch_results):
+        persist_analysis(message, analysis_results)
+        items.append(format_analysis(analysis_results, mode, message))
+    with metrics.time_stage("serialize"):
+        return jsonify({'results': items})
+
+
+def process_job_batch(messages, mode):
+    # Runs in the job workers: analyze, store through the Message model and
+    # return the stored row id with the same response /analyze would give.
+    batch_results = analyze_batch_with_models(messages, mode)
+    outcomes = []
+    for message, analysis_results in zip(messages, batch_results):
+        db_message = save_analysis_to_db(message, analysis_results)
+        outcomes.append((db_message.id, format_analysis(analysis_results, mode, message)))
+    return outcomes
+
+
+job_workers = JobWorkerPool(process_job_batch, JOB_WORKERS, JOB_BATCH_SIZE,
+                            JOB_POLL_INTERVAL_S, JOB_MAX_ATTEMPTS, JOB_LEASE_S)
+
+
+def start_background_services():
+    """Start the batcher, writer and job worker threads of this process.
+
+    Threads do not survive a fork, so pre-forked servers call this in each
+    worker rather than in the master (see gunicorn.conf.py).
+    """
+    for batcher in batchers.values():
+        batcher.start()
+    if db_writer is not None:
+        db_writer.start()
+        atexit.register(db_writer.stop)
+    # Workers for POST /analyze/async; queued jobs survive restarts
+    if JOB_WORKERS > 0:
+        job_workers.start()
+    # Picks up versions published by retraining.py or rolled back elsewhere
+    if MODEL_REGISTRY_POLL_S > 0:
+        model_loader.start_registry_watcher(MODEL_REGISTRY_POLL_S)
+
+
+@api_blueprint.route('/analyze/async', methods=['POST'])
+@limiter.limit("10 per minute")
+def analyze_async():
+    data = request.get_json()
+    messages = data.get('messages')
+    if messages is None and data.get('message'):
+        messages = [data.get('message')]
+
+    error = validate_messages(messages, ASYNC_MAX_MESSAGES)
+    if error:
+        return jsonify({'error': error}), 400
+    mode = get_analysis_mode(data)
+    if mode is None:
+        return jsonify({'error': f'Mode must be one of {", ".join(ANALYSIS_MODES)}'}), 400
+
+    job_ids = enqueue_jobs(messages, mode)
+    job_workers.notify()
+    return jsonify({'jobs': job_ids}), 202
+
+
+@api_blueprint.route('/jobs/<job_id>', methods=['GET'])
+@limiter.limit("120 per minute")
+def get_job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(format_job(job))
 
 
 @api_blueprint.route('/messages', methods=['GET'])
 @limiter.limit("30 per minute")
 @require_api_key
 def get_messages():
+    try:
+        filters = parse_message_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    order = request.args.get('order', 'id')
+    if order not in MESSAGE_ORDERS:
+        return jsonify({'error': f'Order must be one of {", ".join(MESSAGE_ORDERS)}'}), 400
+
+    if request.args.get('format') == 'ndjson':
+        return Response(stream_with_context(ndjson_messages(filters, order)),
+                        mimetype='application/x-ndjson')
+
+    try:
+        limit = int(request.args.get('limit', MESSAGES_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'Limit must be an integer'}), 400
+    if not 1 <= limit <= MESSAGES_MAX_PAGE_SIZE:
+        return jsonify({'error': f'Limit must be between 1 and {MESSAGES_MAX_PAGE_SIZE}'}), 400
+
     db = SessionLocal()
     try:
-        messages = db.query(Message).all()
-        return jsonify([format_message(msg) for msg in messages])
+        with metrics.time_db("query_messages"):
+            messages, next_cursor = page_messages(
+                db, filters, order, request.args.get('cursor'), limit)
+        return jsonify({
+            'messages': [format_message(msg) for msg in messages],
+            'next_cursor': next_cursor,
+        })
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        db.close()
+
+
+def parse_bool_arg(args, name):
+    value = args.get(name)
+    if value is None:
+        return None
+    if value.lower() in ('true', '1'):
+        return True
+    if value.lower() in ('false', '0'):
+        return False
+    raise ValueError(f'{name} must be true or false')
+
+
+def parse_time_arg(args, name):
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO 8601 timestamp')
+    if timestamp.tzinfo is not None:
+        # Stored timestamps are naive UTC
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def parse_message_filters(args):
+    filters = {
+        'verified': parse_bool_arg(args, 'verified'),
+        'used_for_training': parse_bool_arg(args, 'used_for_training'),
+        'since': parse_time_arg(args, 'since'),
+        'until': parse_time_arg(args, 'until'),
+    }
+    for name in LABEL_COLUMNS:
+        filters[name] = args.get(name)
+    return filters
+
+
+def ndjson_messages(filters, order):
+    # The session stays open for as long as the client reads the stream
+    db = SessionLocal()
+    try:
+        for message in stream_messages(db, filters, order, MESSAGES_STREAM_BATCH_SIZE):
+            yield json.dumps(format_message(message)) + '\n'
     finally:
         db.close()
 
@@ -136,3 +724,130 @@ def verify_message(message_id):
         return jsonify({'message': 'Message verified successfully'})
     finally:
         db.close()
+
+
+def parse_verifications(items):
+    """Turn ``[id, {"id": id, "label": 0|1}, ...]`` into {id: label or None}."""
+    if not isinstance(items, list) or not items:
+        raise ValueError('No messages provided')
+    if len(items) > VERIFY_MAX_MESSAGES:
+        raise ValueError(f'At most {VERIFY_MAX_MESSAGES} messages per request')
+    labels = {}
+    for item in items:
+        label = None
+        if isinstance(item, dict):
+            message_id = item.get('id')
+            label = item.get('label')
+        else:
+            message_id = item
+        if not isinstance(message_id, int) or isinstance(message_id, bool):
+            raise ValueError('Message ids must be integers')
+        if label is not None and (label not in (0, 1) or isinstance(label, bool)):
+            raise ValueError('Labels must be 0 (legit) or 1 (fraud)')
+        if labels.get(message_id, label) != label:
+            raise ValueError(f'Conflicting labels for message {message_id}')
+        labels[message_id] = label
+    return labels
+
+
+@api_blueprint.route('/verify_messages', methods=['POST'])
+@limiter.limit("20 per minute")
+@require_api_key
+def verify_messages_bulk():
+    data = request.get_json(silent=True) or {}
+    try:
+        labels = parse_verifications(data.get('messages'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    db = SessionLocal()
+    try:
+        with metrics.time_db("verify_messages"):
+            missing = verify_messages(db, labels)
+    finally:
+        db.close()
+    return jsonify({'verified': len(labels) - len(missing), 'missing': missing})
+
+
+@api_blueprint.route('/stats', methods=['GET'])
+@limiter.limit("30 per minute")
+@require_api_key
+def get_stats():
+    return jsonify({
+        'batching': {name: batcher.stats() for name, batcher in batchers.items()},
+        'cache': result_cache.stats() if result_cache is not None else None,
+        'models': model_loader.status(),
+        'padding': all_padding_stats(),
+        'writer': db_writer.stats() if db_writer is not None else None,
+    })
+
+
+@api_blueprint.route('/models', methods=['GET'])
+@limiter.limit("30 per minute")
+@require_api_key
+def list_models():
+    models = model_loader.status()
+    return jsonify({
+        name: {
+            'served_version': models[name]['version'],
+            'current_version': model_registry.current_version(name),
+            'reloading': models[name]['reloading'],
+            'reload_error': models[name]['reload_error'],
+            'versions': model_registry.list_versions(name),
+        }
+        for name in MODEL_NAMES
+    })
+
+
+@api_blueprint.route('/models/<name>/rollback', methods=['POST'])
+@limiter.limit("10 per minute")
+@require_api_key
+def rollback_model(name):
+    """Point the registry at an earlier version (by default the one before
+    the current) and load it in the background."""
+    if name not in MODEL_NAMES:
+        return jsonify({'error': f'Unknown model: {name}'}), 404
+    data = request.get_json(silent=True) or {}
+    version = data.get('version') or model_registry.previous_version(name)
+    if version is None:
+        return jsonify({'error': f'{name} has no earlier version'}), 409
+    try:
+        model_registry.set_current(name, version)
+    except model_registry.UnknownVersion as e:
+        return jsonify({'error': str(e)}), 404
+    # Other worker processes follow through the registry watcher
+    model_loader.start_reload(name, version)
+    return jsonify({'model': name, 'version': version, 'status': 'reloading'}), 202
+
+
+@api_blueprint.route('/metrics', methods=['GET'])
+@limiter.limit("60 per minute")
+@require_api_key
+def get_metrics():
+    if not metrics.ENABLED:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+
+@api_blueprint.route('/healthz', methods=['GET'])
+@limiter.exempt
+def healthz():
+    # Liveness only: the process is up and serving requests
+    return jsonify({'status': 'ok'})
+
+
+@api_blueprint.route('/readyz', methods=['GET'])
+@limiter.exempt
+def readyz():
+    # Readiness: every model is loaded and warmed up (or, with lazy
+    # loading, none is loading or failed)
+    ready = model_loader.is_ready()
+    models = model_loader.status()
+    if ready:
+        state = 'ready'
+    elif any(model['state'] == 'failed' for model in models.values()):
+        state = 'failed'
+    else:
+        state = 'loading'
+    return jsonify({'status': state, 'models': models}), 200 if ready else 503
@@ -1,8 +1,12 @@
-from utils.config import BACKEND_ADDRESS, BACKEND_PORT, FRONTEND_URL
-from api.routes import api_blueprint, limiter
+from utils.config import BACKEND_ADDRESS, BACKEND_PORT, FRONTEND_URL, MODEL_LOADING
+from api.routes import api_blueprint, initialize_models, limiter, start_background_services
+from models import loader as model_loader
+from utils import metrics
 from flask_cors import CORS
-from flask import Flask, jsonify
+from flask import Flask, g, jsonify, request
+import os
 import sys
+import time
 from os.path import abspath, dirname
 
 # Add the backend directory to the Python path
@@ -17,6 +21,49 @@ CORS(app, resources={r"/*": {"origins": [FRONTEND_URL, "*.vercel.app", "https://
 app.register_blueprint(api_blueprint, url_prefix='/')
 
 
+def start_services():
+    """Load the models and start the background threads of a serving
+    process. Runs on import for the development server and after the fork
+    in each worker of the pre-fork server (gunicorn.conf.py)."""
+    # "eager" blocks until every model is ready, "background" serves requests
+    # (and the liveness probe) right away while models load in a thread, and
+    # "lazy" loads each model on its first use. Models preloaded by a
+    # pre-fork master are already loaded and are skipped.
+    if MODEL_LOADING == "eager":
+        initialize_models()
+    elif MODEL_LOADING == "background":
+        model_loader.start_background_loading(initialize_models)
+    start_background_services()
+
+
+# gunicorn.conf.py sets this so nothing starts in the master process.
+# Model worker processes (MODEL_PROCESSES) are spawned and import this
+# module as __mp_main__; they must not start services either.
+if not os.environ.get("SCAMALYZER_PREFORK") and __name__ != "__mp_main__":
+    start_services()
+
+
+if metrics.ENABLED:
+    @app.before_request
+    def start_request_metrics():
+        g.request_start = time.perf_counter()
+        metrics.request_started()
+
+    @app.after_request
+    def record_response_status(response):
+        g.response_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        if 'request_start' not in g:
+            return
+        # Route templates keep the label set small (no ids or query strings)
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.request_finished(endpoint, request.method, g.get('response_status', 500),
+                                 time.perf_counter() - g.request_start)
+
+
 @app.after_request
 def set_security_headers(response):
     # Content Security Policy - restrictive policy
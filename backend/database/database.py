@@ -1,16 +1,15 @@
-import os
+import hashlib
 from datetime import datetime
 
-from sqlalchemy import (Boolean, Column, DateTime, Float, Integer, String,
-                        create_engine)
+from sqlalchemy import (Boolean, Column, DateTime, Float, Index, Integer,
+                        String, inspect, text)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-os.makedirs("database", exist_ok=True)
+from database.engine import create_db_engine
+from utils.config import DATABASE_URL
 
-# SQLite database setup
-DATABASE_URL = "sqlite:///database/scamalyzer.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_db_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -20,6 +19,8 @@ class Message(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(String, nullable=False)
+    # SHA-256 of content; indexed so duplicate detection is a point lookup
+    content_hash = Column(String(64), unique=True, index=True, nullable=True)
     bert_label = Column(String, nullable=True)
     bert_confidence = Column(Float, nullable=True)
     bilstm_label = Column(String, nullable=True)
@@ -29,6 +30,99 @@ class Message(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
     verified = Column(Boolean, default=False)  # manual verification
     used_for_training = Column(Boolean, default=False)  # retraining usage
+    # Ground truth set by a moderator (1 for fraud, 0 for legit)
+    label = Column(Integer, nullable=True)
+    # Inference engines the results came from (see api/routes.py ENGINES)
+    engines = Column(String, nullable=True)
+
+    # Keyset pagination in timestamp order (GET /messages?order=timestamp)
+    __table_args__ = (Index("ix_messages_timestamp_id", "timestamp", "id"),)
+
+
+# Per-model result columns; NULL for a model that failed or that a tiered
+# analysis skipped
+RESULT_COLUMNS = ('bert_label', 'bert_confidence', 'bilstm_label',
+                  'bilstm_confidence', 'xgboost_label', 'xgboost_confidence')
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def missing_results(stored, row):
+    """Values of ``row`` (a column dict) for the result columns the stored
+    message has empty, so a later full analysis of the same text fills in
+    the BERT result a tiered one left out."""
+    values = {column: row[column] for column in RESULT_COLUMNS
+              if getattr(stored, column) is None and row.get(column) is not None}
+    if values and getattr(stored, 'engines') != row.get('engines'):
+        # Results from different engines; never reused by the result cache
+        values['engines'] = None
+    return values
+
+
+def migrate_content_hash(batch_size=1000):
+    """Add and backfill the content_hash column on databases created before
+    it existed. Rows whose content duplicates an earlier row keep a NULL
+    hash, which the unique index allows."""
+    columns = [column["name"] for column in inspect(engine).get_columns("messages")]
+    with engine.begin() as conn:
+        if "content_hash" not in columns:
+            conn.execute(text(
+                "ALTER TABLE messages ADD COLUMN content_hash VARCHAR(64)"))
+        # NULLs do not collide, so the index can exist before the backfill
+        # and makes each duplicate check below a point lookup.
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_messages_content_hash "
+            "ON messages (content_hash)"))
+
+        last_id = 0
+        backfilled = 0
+        while True:
+            rows = conn.execute(text(
+                "SELECT id, content FROM messages "
+                "WHERE content_hash IS NULL AND id > :last_id "
+                "ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": batch_size}).fetchall()
+            if not rows:
+                break
+            for message_id, content in rows:
+                digest = content_hash(content)
+                duplicate = conn.execute(text(
+                    "SELECT 1 FROM messages WHERE content_hash = :digest"),
+                    {"digest": digest}).first()
+                if duplicate is None:
+                    conn.execute(text(
+                        "UPDATE messages SET content_hash = :digest WHERE id = :id"),
+                        {"digest": digest, "id": message_id})
+                    backfilled += 1
+            last_id = rows[-1][0]
+        if backfilled:
+            print(f"Backfilled content_hash for {backfilled} messages")
+
+
+def migrate_label():
+    columns = [column["name"] for column in inspect(engine).get_columns("messages")]
+    if "label" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE messages ADD COLUMN label INTEGER"))
+
+
+def migrate_engines():
+    columns = [column["name"] for column in inspect(engine).get_columns("messages")]
+    if "engines" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE messages ADD COLUMN engines VARCHAR"))
+
+
+def create_missing_indexes():
+    # create_all skips indexes on tables that already exist
+    for index in Message.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
 
 
 Base.metadata.create_all(bind=engine)
+migrate_content_hash()
+migrate_label()
+migrate_engines()
+create_missing_indexes()
@@ -0,0 +1,58 @@
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+from utils.config import (DB_MAX_OVERFLOW, DB_POOL_RECYCLE_S, DB_POOL_SIZE,
+                          DB_POOL_TIMEOUT_S, SQLITE_BUSY_TIMEOUT_S)
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+_engines = []
+
+
+def create_db_engine(url):
+    """Create an engine for ``url`` with settings suited to the server.
+
+    Relative SQLite paths are resolved against the backend directory, so the
+    API and the retraining script open the same file wherever they are run
+    from. SQLite connections use WAL journaling, so readers never block the
+    writer, with ``synchronous=NORMAL`` and a busy timeout instead of failing
+    immediately on a locked database. Server databases such as PostgreSQL get
+    a bounded connection pool that checks connections before use.
+    """
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        engine = create_engine(url, pool_size=DB_POOL_SIZE,
+                               max_overflow=DB_MAX_OVERFLOW,
+                               pool_timeout=DB_POOL_TIMEOUT_S,
+                               pool_recycle=DB_POOL_RECYCLE_S,
+                               pool_pre_ping=True)
+        _engines.append(engine)
+        return engine
+
+    if url.database and url.database != ":memory:":
+        path = url.database
+        if not os.path.isabs(path):
+            path = os.path.join(BACKEND_DIR, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        url = url.set(database=path)
+    engine = create_engine(url, connect_args={
+        "check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_S})
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_S * 1000)}")
+        cursor.close()
+
+    _engines.append(engine)
+    return engine
+
+
+def dispose_engines_after_fork():
+    """Drop pooled connections inherited from the parent process without
+    closing them, so a forked worker opens its own."""
+    for engine in _engines:
+        engine.dispose(close=False)
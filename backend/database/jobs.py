@@ -0,0 +1,168 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import (Column, DateTime, Integer, String, Text, inspect, or_,
+                        text, update)
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from database.engine import create_db_engine
+from utils.config import JOB_RETRY_DELAY_S, JOBS_DATABASE_URL
+
+# The job queue lives in its own SQLite file so polling workers never
+# contend with writes to the messages table.
+jobs_engine = create_db_engine(JOBS_DATABASE_URL)
+JobsSession = sessionmaker(autocommit=False, autoflush=False, bind=jobs_engine)
+JobsBase = declarative_base()
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job(JobsBase):
+    __tablename__ = "jobs"
+
+    id = Column(String(32), primary_key=True)
+    content = Column(Text, nullable=False)
+    mode = Column(String, nullable=True)
+    status = Column(String, nullable=False, default=QUEUED, index=True)
+    attempts = Column(Integer, default=0)
+    message_id = Column(Integer, nullable=True)  # row in the messages table
+    result = Column(Text, nullable=True)  # JSON analysis response
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    not_before = Column(DateTime, nullable=True)  # retry backoff
+
+
+def migrate_not_before():
+    columns = [column["name"] for column in inspect(jobs_engine).get_columns("jobs")]
+    if "not_before" not in columns:
+        with jobs_engine.begin() as conn:
+            conn.execute(text("ALTER TABLE jobs ADD COLUMN not_before DATETIME"))
+
+
+JobsBase.metadata.create_all(bind=jobs_engine)
+migrate_not_before()
+
+
+def enqueue_jobs(messages, mode=None):
+    db = JobsSession()
+    try:
+        jobs = [Job(id=uuid.uuid4().hex, content=message, mode=mode, status=QUEUED)
+                for message in messages]
+        db.add_all(jobs)
+        db.commit()
+        return [job.id for job in jobs]
+    finally:
+        db.close()
+
+
+def claim_jobs(limit):
+    """Atomically move up to ``limit`` queued jobs to running. A job is only
+    claimed if its status is still queued, so concurrent workers (threads or
+    processes) never run the same job twice."""
+    db = JobsSession()
+    try:
+        now = datetime.utcnow()
+        candidates = db.query(Job.id).filter(
+            Job.status == QUEUED,
+            or_(Job.not_before.is_(None), Job.not_before <= now)).order_by(
+            Job.created_at).limit(limit).all()
+        claimed = []
+        for (job_id,) in candidates:
+            updated = db.execute(update(Job).where(
+                Job.id == job_id, Job.status == QUEUED).values(
+                status=RUNNING, started_at=now, attempts=Job.attempts + 1))
+            if updated.rowcount == 1:
+                claimed.append(job_id)
+        db.commit()
+        if not claimed:
+            return []
+        jobs = db.query(Job).filter(Job.id.in_(claimed)).all()
+        db.expunge_all()
+        return jobs
+    finally:
+        db.close()
+
+
+def complete_job(job_id, message_id, result):
+    db = JobsSession()
+    try:
+        db.execute(update(Job).where(Job.id == job_id).values(
+            status=DONE, message_id=message_id, result=json.dumps(result),
+            error=None, finished_at=datetime.utcnow()))
+        db.commit()
+    finally:
+        db.close()
+
+
+def retry_time(attempts, delay_s=JOB_RETRY_DELAY_S):
+    """When a job that failed ``attempts`` times may run again: exponential
+    backoff, so a failing job is not retried in a tight loop."""
+    return datetime.utcnow() + timedelta(seconds=delay_s * 2 ** max(0, attempts - 1))
+
+
+def fail_job(job_id, error, max_attempts):
+    """Requeue the job after a backoff, or mark it failed once it has used
+    all attempts."""
+    db = JobsSession()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if job is None:
+            return
+        job.error = error
+        if job.attempts >= max_attempts:
+            job.status = FAILED
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = QUEUED
+            job.not_before = retry_time(job.attempts)
+        db.commit()
+    finally:
+        db.close()
+
+
+def requeue_stale_jobs(lease_s, max_attempts):
+    """Return jobs left running by a worker that died to the queue. A job
+    that has used all its attempts is failed instead, so a message that
+    kills the process (e.g. out of memory) is not retried forever."""
+    db = JobsSession()
+    try:
+        now = datetime.utcnow()
+        stale = (Job.status == RUNNING, Job.started_at < now - timedelta(seconds=lease_s))
+        failed = db.execute(update(Job).where(
+            *stale, Job.attempts >= max_attempts).values(
+            status=FAILED, finished_at=now,
+            error="The worker stopped before the job finished"))
+        requeued = db.execute(update(Job).where(*stale).values(
+            status=QUEUED, not_before=None))
+        db.commit()
+        return requeued.rowcount + failed.rowcount
+    finally:
+        db.close()
+
+
+def get_job(job_id):
+    db = JobsSession()
+    try:
+        return db.query(Job).filter(Job.id == job_id).first()
+    finally:
+        db.close()
+
+
+def format_job(job):
+    return {
+        'id': job.id,
+        'status': job.status,
+        'attempts': job.attempts,
+        'message_id': job.message_id,
+        'result': json.loads(job.result) if job.result else None,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,120 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_, update
+
+from database.database import Message
+
+MESSAGE_ORDERS = ('id', 'timestamp')
+LABEL_COLUMNS = {
+    'bert_label': Message.bert_label,
+    'bilstm_label': Message.bilstm_label,
+    'xgboost_label': Message.xgboost_label,
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(message, order):
+    key = [message.id]
+    if order == 'timestamp':
+        key = [message.timestamp.isoformat(), message.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor, order):
+    """Return the (timestamp, id) or (id,) key a page continues after."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if order == 'timestamp':
+            timestamp, message_id = key
+            return datetime.fromisoformat(timestamp), int(message_id)
+        (message_id,) = key
+        return (int(message_id),)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}") from e
+
+
+def filter_messages(query, filters):
+    """Apply the optional filters of GET /messages.
+
+    ``filters`` may hold ``verified``/``used_for_training`` booleans, a value
+    for any of ``LABEL_COLUMNS`` and ``since``/``until`` datetimes
+    (inclusive/exclusive).
+    """
+    for name in ('verified', 'used_for_training'):
+        if filters.get(name) is not None:
+            query = query.filter(getattr(Message, name) == filters[name])
+    for name, column in LABEL_COLUMNS.items():
+        if filters.get(name) is not None:
+            query = query.filter(column == filters[name])
+    if filters.get('since') is not None:
+        query = query.filter(Message.timestamp >= filters['since'])
+    if filters.get('until') is not None:
+        query = query.filter(Message.timestamp < filters['until'])
+    return query
+
+
+def ordered_messages(db, filters, order='id'):
+    query = filter_messages(db.query(Message), filters)
+    if order == 'timestamp':
+        return query.order_by(Message.timestamp, Message.id)
+    return query.order_by(Message.id)
+
+
+def page_messages(db, filters, order='id', cursor=None, limit=100):
+    """Return one page of messages and the cursor of the next page (None on
+    the last page). The cursor holds the sort key of the last row, so each
+    page is an index range scan instead of an OFFSET."""
+    query = ordered_messages(db, filters, order)
+    if cursor is not None:
+        key = decode_cursor(cursor, order)
+        if order == 'timestamp':
+            timestamp, message_id = key
+            query = query.filter(or_(
+                Message.timestamp > timestamp,
+                and_(Message.timestamp == timestamp, Message.id > message_id)))
+        else:
+            query = query.filter(Message.id > key[0])
+    # One extra row tells whether another page follows
+    messages = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = encode_cursor(messages[-1], order)
+    return messages, next_cursor
+
+
+def stream_messages(db, filters, order='id', batch_size=1000):
+    """Yield every matching message, fetching ``batch_size`` rows at a time
+    from a server-side cursor where the driver supports one."""
+    yield from ordered_messages(db, filters, order).yield_per(batch_size)
+
+
+def verify_messages(db, labels):
+    """Mark messages as verified in one transaction.
+
+    ``labels`` maps a message id to its ground-truth label, or to None to
+    only verify it. Messages are updated with one ``UPDATE ... WHERE id IN``
+    per distinct label. Returns the ids that do not exist.
+    """
+    ids = list(labels)
+    existing = set()
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        existing.update(message_id for (message_id,) in db.query(Message.id).filter(
+            Message.id.in_(chunk)))
+
+    by_label = {}
+    for message_id in existing:
+        by_label.setdefault(labels[message_id], []).append(message_id)
+    for label, message_ids in by_label.items():
+        values = {'verified': True}
+        if label is not None:
+            values['label'] = label
+        db.execute(update(Message).where(Message.id.in_(message_ids)).values(**values))
+    db.commit()
+    return [message_id for message_id in ids if message_id not in existing]
@@ -0,0 +1,187 @@
+import queue
+import threading
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+from database.database import (RESULT_COLUMNS, Message, SessionLocal,
+                               missing_results)
+from utils import metrics
+
+
+class WriteBehindWriter:
+    """Buffers new ``Message`` rows and writes them in bulk transactions.
+
+    Rows are plain column dicts that include ``content_hash``. A background
+    thread flushes the buffer when it holds ``batch_size`` rows or every
+    ``flush_interval_s`` seconds. Duplicates are dropped inside the buffer
+    and against the table with one indexed ``IN`` query per flush, so each
+    flush is a single transaction instead of one commit per request.
+
+    A flush that fails (e.g. the database is locked or the connection
+    dropped) is retried ``retries`` times with exponential backoff, then
+    the rows are written one transaction each. Rows that still fail are
+    dropped and counted under ``dropped`` in ``stats()``.
+    """
+
+    def __init__(self, max_queue_size=10000, batch_size=200, flush_interval_s=1.0,
+                 retries=3, retry_delay_s=0.5):
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.retries = retries
+        self.retry_delay_s = retry_delay_s
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.duplicates = 0
+        self.backfilled = 0
+        self.flushes = 0
+        self.overflows = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        """Queue a row; returns False when the queue is full so the caller can
+        write synchronously instead of dropping the row."""
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.overflows += 1
+            return False
+
+    def stop(self, timeout=10):
+        """Stop the writer thread and flush everything still buffered."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._write(self._drain(None))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'written': self.written,
+                'duplicates': self.duplicates,
+                'backfilled': self.backfilled,
+                'flushes': self.flushes,
+                'overflows': self.overflows,
+                'failed_flushes': self.failed_flushes,
+                'dropped': self.dropped,
+            }
+
+    def _drain(self, limit):
+        rows = []
+        while limit is None or len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _run(self):
+        while not self._stopped.is_set():
+            deadline = time.monotonic() + self.flush_interval_s
+            rows = []
+            while len(rows) < self.batch_size and not self._stopped.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    rows.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                rows.extend(self._drain(self.batch_size - len(rows)))
+            if rows:
+                self._write(rows)
+
+    def _write(self, rows):
+        """Flush ``rows``, retrying with backoff; the rows are off the queue,
+        so giving up here loses them."""
+        if not rows:
+            return
+        for attempt in range(self.retries + 1):
+            try:
+                self._flush(rows)
+                return
+            except Exception as e:
+                with self._lock:
+                    self.failed_flushes += 1
+                print(f"Write-behind flush of {len(rows)} rows failed "
+                      f"(attempt {attempt + 1}): {e}")
+            if attempt < self.retries:
+                time.sleep(self.retry_delay_s * 2 ** attempt)
+        # Row by row, so one bad row or a short outage loses as little as possible
+        for row in rows:
+            try:
+                self._flush([row])
+            except Exception as e:
+                with self._lock:
+                    self.dropped += 1
+                print(f"Write-behind dropped a row: {e}")
+
+    def _flush(self, rows):
+        if not rows:
+            return
+        # Keep the first row for each content hash within the buffer
+        unique = {}
+        for row in rows:
+            first = unique.setdefault(row['content_hash'], row)
+            for column in RESULT_COLUMNS:
+                if first[column] is None:
+                    first[column] = row[column]
+        duplicates = len(rows) - len(unique)
+
+        db = SessionLocal()
+        try:
+            result_columns = [getattr(Message, column) for column in RESULT_COLUMNS]
+            result_columns.append(Message.engines)
+            existing = {stored.content_hash: stored for stored in db.query(
+                Message.content_hash, *result_columns).filter(
+                Message.content_hash.in_(list(unique)))}
+            new_rows = [row for digest, row in unique.items() if digest not in existing]
+            duplicates += len(unique) - len(new_rows)
+            # Duplicates may carry results the stored row lacks (e.g. BERT
+            # after a tiered analysis)
+            backfills = {digest: missing_results(stored, unique[digest])
+                         for digest, stored in existing.items()}
+            backfills = {digest: values for digest, values in backfills.items() if values}
+            for digest, values in backfills.items():
+                db.query(Message).filter(Message.content_hash == digest).update(
+                    values, synchronize_session=False)
+            if backfills:
+                db.commit()
+            try:
+                with metrics.time_db("bulk_save"):
+                    db.bulk_insert_mappings(Message, new_rows)
+                    db.commit()
+                written = len(new_rows)
+            except IntegrityError:
+                # A synchronous writer inserted one of them meanwhile; fall
+                # back to row-by-row inserts for this flush.
+                db.rollback()
+                written = 0
+                for row in new_rows:
+                    try:
+                        db.bulk_insert_mappings(Message, [row])
+                        db.commit()
+                        written += 1
+                    except IntegrityError:
+                        db.rollback()
+                        duplicates += 1
+        finally:
+            db.close()
+
+        with self._lock:
+            self.written += written
+            self.duplicates += duplicates
+            self.backfilled += len(backfills)
+            self.flushes += 1
@@ -0,0 +1,97 @@
+# gunicorn.conf.py
+# Pre-fork production server. The master imports the app and loads the
+# models in PREFORK_PRELOAD_MODELS once; the forked workers then share those
+# read-only weights copy-on-write instead of each loading its own copy.
+#
+# Usage (from the backend directory):
+#   gunicorn -c gunicorn.conf.py
+import gc
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# Read by app.py: models and threads are started per worker, not in the master
+os.environ["SCAMALYZER_PREFORK"] = "1"
+
+cpu_count = os.cpu_count() or 1
+workers = int(os.getenv("SERVER_WORKERS", str(max(1, cpu_count // 2))))
+# Split the cores between the workers so their intra-op pools do not
+# oversubscribe the CPU. Set before any ML library is imported, since
+# PyTorch, XGBoost (OpenMP) and TensorFlow read these at import time.
+# Unset and 0 both mean "split", since 0 would give every worker all cores.
+if os.getenv("INTRA_OP_THREADS", "0") in ("", "0"):
+    os.environ["INTRA_OP_THREADS"] = str(max(1, cpu_count // workers))
+for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"):
+    if os.getenv(variable, "0") in ("", "0"):
+        os.environ[variable] = os.environ["INTRA_OP_THREADS"]
+os.environ.setdefault("TF_NUM_INTEROP_THREADS", "1")
+
+from utils.config import (BACKEND_ADDRESS, BACKEND_PORT,  # noqa: E402
+                          MODEL_PROCESSES, PREFORK_PRELOAD_MODELS,
+                          RATELIMIT_ENABLED, RATELIMIT_STORAGE_URI,
+                          SERVER_THREADS, SERVER_TIMEOUT_S)
+
+# In-memory limits are counted per worker, so N workers would silently
+# allow N times the configured rates
+if RATELIMIT_ENABLED and RATELIMIT_STORAGE_URI.startswith("memory://") and workers > 1:
+    raise RuntimeError(
+        f"RATELIMIT_STORAGE_URI is memory://, which {workers} workers cannot share. "
+        "Point it at a shared store such as redis://localhost:6379, or set SERVER_WORKERS=1.")
+
+wsgi_app = "app:app"
+bind = f"{BACKEND_ADDRESS}:{BACKEND_PORT}"
+worker_class = "gthread"
+threads = SERVER_THREADS
+timeout = SERVER_TIMEOUT_S
+preload_app = True
+
+
+def when_ready(server):
+    from models import loader as model_loader
+
+    for name in PREFORK_PRELOAD_MODELS:
+        if name in MODEL_PROCESSES:
+            continue  # worker processes are started by each server worker
+        try:
+            # No warmup here: running inference would start thread pools
+            # (OpenMP) in the master that the forked workers cannot use.
+            model_loader.load(name, warmup=False)
+        except Exception:
+            pass  # recorded in the loader status; workers retry the load
+    # Move everything allocated so far out of the collector's reach, so
+    # garbage collection in the workers does not touch (and copy) the pages
+    # holding the shared model objects.
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import start_services
+    from database.engine import dispose_engines_after_fork
+    from models import loader as model_loader
+    from utils.config import MODEL_WARMUP
+
+    dispose_engines_after_fork()
+    if MODEL_WARMUP:
+        for name in PREFORK_PRELOAD_MODELS:
+            if model_loader.loaded_version(name) is not None:
+                model_loader.warm_up(name)
+    start_services()
+
+
+def worker_exit(server, worker):
+    from api.routes import db_writer
+    from models import loader as model_loader
+
+    if db_writer is not None:
+        db_writer.stop()
+    model_loader.close_process_pools()
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of a dead worker from the aggregated /metrics
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,20 +1,94 @@
+import os
+
+import numpy as np
 import torch
 from transformers import AutoModelForSequenceClassification, AutoTokenizer
 
-from utils.config import BERT_MODEL_PATH
+from models.bundle import open_bundle
+from utils import metrics
+from utils.artifacts import artifact_version
+from utils.bucketing import length_buckets, padding_stats
+from utils.config import (BERT_BUCKET_MAX_SIZE, BERT_ENGINE, BERT_MODEL_PATH,
+                          BERT_ONNX_PATH, BUCKET_MAX_LENGTH_RATIO,
+                          MODEL_BUNDLE_DIR, ONNX_INTRA_OP_THREADS)
 
-# Load BERT model and tokenizer
-tokenizer = AutoTokenizer.from_pretrained(BERT_MODEL_PATH)
-model = AutoModelForSequenceClassification.from_pretrained(BERT_MODEL_PATH)
-model.eval()
+MAX_LEN = 256
 
+# Populated by load_model(); see models/loader.py
+tokenizer = None
+model = None
+session = None  # ONNX Runtime session when BERT_ENGINE is "onnx"
+MODEL_VERSION = None
 
-def analyze_message(message):
-    inputs = tokenizer(message, truncation=True, padding=True,
-                       max_length=256, return_tensors="pt")
+
+def load_model(model_path=BERT_MODEL_PATH, engine=BERT_ENGINE, onnx_path=BERT_ONNX_PATH,
+               bundle_path=os.path.join(MODEL_BUNDLE_DIR, "BERT")):
+    global tokenizer, model, session, MODEL_VERSION
+    if open_bundle(bundle_path, "BERT", (model_path,)) is not None:
+        # Same model with memory-mapped safetensors weights and a fast
+        # tokenizer that loads from a single tokenizer.json
+        model_path = bundle_path
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    if engine == "onnx":
+        # Only needed for this engine, so it stays an optional dependency
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ONNX_INTRA_OP_THREADS > 0:
+            options.intra_op_num_threads = ONNX_INTRA_OP_THREADS
+        session = ort.InferenceSession(
+            onnx_path, options, providers=["CPUExecutionProvider"])
+        model = None
+        MODEL_VERSION = artifact_version(model_path, onnx_path)
+    else:
+        model = AutoModelForSequenceClassification.from_pretrained(model_path)
+        model.eval()
+        session = None
+        MODEL_VERSION = artifact_version(model_path)
+
+
+def predict_probs_torch(features):
+    batch = tokenizer.pad(features, return_tensors="pt")
     with torch.no_grad():
-        outputs = model(**inputs)
-    probs = torch.softmax(outputs.logits, dim=1).numpy()[0]
-    label = int(probs[1] > 0.5)  # 1 for fraud, 0 for legit
-    confidence = float(probs[label])
-    return label, confidence
+        outputs = model(**batch)
+    return torch.softmax(outputs.logits, dim=1).numpy()
+
+
+def predict_probs_onnx(features):
+    batch = tokenizer.pad(features, return_tensors="np")
+    logits = session.run(["logits"], {
+        "input_ids": batch["input_ids"].astype(np.int64),
+        "attention_mask": batch["attention_mask"].astype(np.int64),
+    })[0]
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def analyze_messages(messages):
+    # Tokenize once without padding, then pad each length bucket only to its
+    # own longest sequence. The attention mask keeps padded positions out of
+    # each row's result, and results are returned in input order.
+    with metrics.time_model("BERT", "tokenize"):
+        encoded = tokenizer(list(messages), truncation=True, max_length=MAX_LEN)
+    lengths = [len(ids) for ids in encoded["input_ids"]]
+    predict_probs = predict_probs_onnx if session is not None else predict_probs_torch
+    stats = padding_stats("BERT")
+
+    results = [None] * len(lengths)
+    for bucket in length_buckets(lengths, BERT_BUCKET_MAX_SIZE, BUCKET_MAX_LENGTH_RATIO):
+        features = [{key: encoded[key][i] for key in encoded.keys()}
+                    for i in bucket]
+        with metrics.time_model("BERT", "infer"):
+            probs = predict_probs(features)
+        stats.record([lengths[i] for i in bucket])
+        for i, row in zip(bucket, probs):
+            label = int(row[1] > 0.5)  # 1 for fraud, 0 for legit
+            confidence = float(row[label])
+            results[i] = (label, confidence)
+    return results
+
+
+def analyze_message(message):
+    return analyze_messages([message])[0]
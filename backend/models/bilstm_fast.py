@@ -0,0 +1,190 @@
+import os
+import threading
+
+import numpy as np
+import tensorflow as tf
+from keras.models import model_from_json
+
+
+class VocabularyLookup:
+    """Precompiled replacement for Keras ``Tokenizer.texts_to_sequences``
+    followed by ``pad_sequences(padding="post", truncating="post")``.
+
+    The filter translation table and a word -> index map that already applies
+    ``num_words`` and the OOV token are built once, so encoding a message is a
+    single ``str.translate``, a split and dictionary lookups written straight
+    into a preallocated array. The sequences are identical to the Keras ones.
+    """
+
+    def __init__(self, word_index, num_words=None, oov_token=None,
+                 filters='', lower=True, split=' '):
+        self.lower = lower
+        self.split = split
+        self.filters = filters
+        self.translate_map = str.maketrans({c: split for c in filters})
+        oov_index = word_index.get(oov_token) if oov_token is not None else None
+        self.oov_index = oov_index
+        if num_words:
+            # Words outside the top num_words fall back to the OOV index,
+            # or are dropped when there is no OOV token.
+            self.index = {word: (i if i < num_words else oov_index)
+                          for word, i in word_index.items()}
+        else:
+            self.index = dict(word_index)
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer):
+        if tokenizer.char_level:
+            raise ValueError("Character-level tokenizers are not supported")
+        return cls(tokenizer.word_index, tokenizer.num_words, tokenizer.oov_token,
+                   tokenizer.filters, tokenizer.lower, tokenizer.split)
+
+    def save_table(self, directory):
+        """Write the word -> index map as a binary table (all words in one
+        text file plus character offsets and indices as .npy arrays);
+        returns the settings ``load_table`` needs."""
+        words = [word for word, i in self.index.items() if i is not None]
+        offsets = np.zeros(len(words) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(word) for word in words])
+        with open(os.path.join(directory, "vocab_words.txt"), "w",
+                  encoding="utf-8", newline="") as f:
+            f.write("".join(words))
+        np.save(os.path.join(directory, "vocab_offsets.npy"), offsets)
+        np.save(os.path.join(directory, "vocab_ids.npy"),
+                np.array([self.index[word] for word in words], dtype=np.int32))
+        return {'oov_index': self.oov_index, 'filters': self.filters,
+                'lower': self.lower, 'split': self.split}
+
+    @classmethod
+    def load_table(cls, directory, settings):
+        with open(os.path.join(directory, "vocab_words.txt"), encoding="utf-8", newline="") as f:
+            text = f.read()
+        offsets = np.load(os.path.join(directory, "vocab_offsets.npy")).tolist()
+        ids = np.load(os.path.join(directory, "vocab_ids.npy")).tolist()
+        lookup = cls({}, filters=settings['filters'], lower=settings['lower'],
+                     split=settings['split'])
+        # Words whose index is None (beyond num_words without an OOV token)
+        # are not stored; they are dropped either way
+        lookup.index = dict(zip((text[start:end] for start, end in zip(offsets, offsets[1:])), ids))
+        lookup.oov_index = settings['oov_index']
+        return lookup
+
+    def to_sequence(self, text):
+        if self.lower:
+            text = text.lower()
+        words = text.translate(self.translate_map).split(self.split)
+        index = self.index
+        oov_index = self.oov_index
+        sequence = []
+        for word in words:
+            if not word:
+                continue
+            i = index.get(word, oov_index)
+            if i is not None:
+                sequence.append(i)
+        return sequence
+
+    def encode_batch(self, texts, max_len):
+        padded = np.zeros((len(texts), max_len), dtype=np.int32)
+        for row, text in enumerate(texts):
+            sequence = self.to_sequence(text)[:max_len]
+            padded[row, :len(sequence)] = sequence
+        return padded
+
+
+class KerasEngine:
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, padded):
+        return self.model.predict(padded)[:, 0]
+
+
+class CompiledEngine:
+    """Runs the model through a traced ``tf.function`` with a fixed input
+    signature, skipping the data pipeline and callbacks of ``model.predict``."""
+
+    def __init__(self, model, max_len):
+        self.model = model
+        self._fn = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec(shape=[None, max_len], dtype=tf.int32)])
+
+    def predict(self, padded):
+        return self._fn(tf.constant(padded)).numpy()[:, 0]
+
+
+class TFLiteEngine:
+    """Runs a converted TFLite model. The interpreter is not thread-safe, so
+    calls are serialized; the input is resized only when the batch size
+    changes."""
+
+    def __init__(self, tflite_path, num_threads=None):
+        self._interpreter = tf.lite.Interpreter(
+            model_path=tflite_path, num_threads=num_threads)
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def predict(self, padded):
+        with self._lock:
+            if padded.shape[0] != self._batch_size:
+                self._interpreter.resize_tensor_input(
+                    self._input['index'], padded.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = padded.shape[0]
+            self._interpreter.set_tensor(
+                self._input['index'], padded.astype(self._input['dtype']))
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output['index'])[:, 0].copy()
+
+
+def save_model_arrays(model, directory):
+    """Write the architecture as JSON and every weight as a .npy array;
+    returns the settings ``load_model_arrays`` needs. Rebuilding the model
+    from them skips the HDF5 parsing and the optimizer state and compile
+    step of ``keras.models.load_model``."""
+    with open(os.path.join(directory, "keras_model.json"), "w", encoding="utf-8") as f:
+        f.write(model.to_json())
+    os.makedirs(os.path.join(directory, "weights"))
+    weights = model.get_weights()
+    for i, array in enumerate(weights):
+        np.save(os.path.join(directory, "weights", f"{i:03d}.npy"), array)
+    return {'weights': len(weights)}
+
+
+def load_model_arrays(directory, settings):
+    with open(os.path.join(directory, "keras_model.json"), encoding="utf-8") as f:
+        model = model_from_json(f.read())
+    model.set_weights([np.load(os.path.join(directory, "weights", f"{i:03d}.npy"))
+                       for i in range(settings['weights'])])
+    return model
+
+
+def convert_to_tflite(model, tflite_path):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    # LSTM layers may need TF ops that have no TFLite builtin equivalent
+    converter.target_spec.supported_ops = [
+        tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+    converter._experimental_lower_tensor_list_ops = False
+    tflite_model = converter.convert()
+    os.makedirs(os.path.dirname(tflite_path) or ".", exist_ok=True)
+    tmp_path = tflite_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(tflite_model)
+    os.replace(tmp_path, tflite_path)
+    print(f"Converted BiLSTM model to TFLite: {tflite_path}")
+
+
+def create_engine(name, model, max_len, model_path=None, tflite_path=None,
+                  num_threads=None):
+    if name == "function":
+        return CompiledEngine(model, max_len)
+    if name == "tflite":
+        # Reconvert whenever the Keras model is newer than the TFLite file
+        if (not os.path.exists(tflite_path)
+                or os.path.getmtime(tflite_path) < os.path.getmtime(model_path)):
+            convert_to_tflite(model, tflite_path)
+        return TFLiteEngine(tflite_path, num_threads)
+    return KerasEngine(model)
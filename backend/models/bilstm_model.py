@@ -1,25 +1,73 @@
-import json
+import os
 
-from keras.models import load_model
-from keras.preprocessing.sequence import pad_sequences
+from keras.models import load_model as load_keras_model
 from tensorflow.keras.preprocessing.text import tokenizer_from_json
 
-from utils.config import BILSTM_MODEL_PATH, BILSTM_TOKENIZER_PATH
+from models.bilstm_fast import (TFLiteEngine, VocabularyLookup, create_engine,
+                                load_model_arrays)
+from models.bundle import open_bundle
+from utils import metrics
+from utils.artifacts import artifact_version
+from utils.config import (BILSTM_ENGINE, BILSTM_MODEL_PATH,
+                          BILSTM_TFLITE_PATH, BILSTM_TOKENIZER_PATH,
+                          MODEL_BUNDLE_DIR, TFLITE_NUM_THREADS)
 
-# Load BiLSTM model and tokenizer
 MAX_LEN = 200
-model = load_model(BILSTM_MODEL_PATH)
 
-with open(BILSTM_TOKENIZER_PATH, "r") as f:
-    tokenizer_json = f.read()
-tokenizer = tokenizer_from_json(tokenizer_json)
+# Populated by load_model(); see models/loader.py
+model = None
+tokenizer = None
+vocabulary = None
+engine = None
+MODEL_VERSION = None
+
+
+def load_model(model_path=BILSTM_MODEL_PATH, tokenizer_path=BILSTM_TOKENIZER_PATH,
+               engine_name=BILSTM_ENGINE, tflite_path=BILSTM_TFLITE_PATH,
+               bundle_path=os.path.join(MODEL_BUNDLE_DIR, "BiLSTM")):
+    global model, tokenizer, vocabulary, engine, MODEL_VERSION
+    manifest = open_bundle(bundle_path, "BiLSTM", (model_path, tokenizer_path))
+    if manifest is not None:
+        # The binary vocabulary table replaces parsing the tokenizer JSON
+        tokenizer = None
+        vocabulary = VocabularyLookup.load_table(bundle_path, manifest['settings']['vocabulary'])
+        if engine_name == "tflite":
+            # The bundled TFLite model skips the HDF5 Keras load entirely
+            model = None
+            engine = TFLiteEngine(os.path.join(bundle_path, "model.tflite"), TFLITE_NUM_THREADS)
+            MODEL_VERSION = artifact_version(bundle_path)
+            return
+        if 'keras' in manifest['settings']:
+            # Rebuilt from the bundled architecture and weight arrays; bundles
+            # built before these were added fall back to the HDF5 file
+            model = load_model_arrays(bundle_path, manifest['settings']['keras'])
+            engine = create_engine(engine_name, model, MAX_LEN)
+            MODEL_VERSION = artifact_version(bundle_path)
+            return
+    else:
+        with open(tokenizer_path, "r") as f:
+            tokenizer_json = f.read()
+        tokenizer = tokenizer_from_json(tokenizer_json)
+        vocabulary = VocabularyLookup.from_tokenizer(tokenizer)
+    model = load_keras_model(model_path)
+    engine = create_engine(engine_name, model, MAX_LEN, model_path,
+                           tflite_path, TFLITE_NUM_THREADS)
+    MODEL_VERSION = artifact_version(model_path, tokenizer_path)
+
+
+def analyze_messages(messages):
+    # Same sequences as tokenizer.texts_to_sequences + post padding/truncating
+    with metrics.time_model("BiLSTM", "tokenize"):
+        padded = vocabulary.encode_batch(list(messages), MAX_LEN)
+    with metrics.time_model("BiLSTM", "infer"):
+        probs = engine.predict(padded)
+    results = []
+    for prob in probs:
+        label = int(prob > 0.5)  # 1 for fraud, 0 for legit
+        confidence = float(prob if label == 1 else 1 - prob)
+        results.append((label, confidence))
+    return results
 
 
 def analyze_message(message):
-    seq = tokenizer.texts_to_sequences([message])
-    padded = pad_sequences(seq, maxlen=MAX_LEN,
-                           padding="post", truncating="post")
-    prob = model.predict(padded)[0][0]
-    label = int(prob > 0.5)  # 1 for fraud, 0 for legit
-    confidence = float(prob if label == 1 else 1 - prob)
-    return label, confidence
+    return analyze_messages([message])[0]
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+from utils.artifacts import artifact_fingerprint
+from utils.config import MODEL_BUNDLE_VERIFY, MODEL_BUNDLES
+
+# A bundle holds one model's trained artifacts converted to formats that
+# load fast or are memory-mapped:
+#   BERT     safetensors weights, config and the fast tokenizer (tokenizer.json)
+#   BiLSTM   the TFLite model, the Keras architecture as JSON with its
+#            weights as .npy arrays, and the vocabulary as a binary lookup table
+#   XGBoost  the booster in XGBoost's binary UBJSON format and the TF-IDF
+#            vocabulary and idf as .npy arrays
+# manifest.json lists every file with its size and SHA-256, and a
+# fingerprint of the artifacts the bundle was built from. A bundle whose
+# artifacts have changed since is ignored, so it never serves a stale model.
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+# load_model() keywords of the trained artifacts a bundle is built from
+SOURCE_ARTIFACTS = {
+    'BERT': ('model_path',),
+    'BiLSTM': ('model_path', 'tokenizer_path'),
+    'XGBoost': ('model_path', 'tfidf_path'),
+}
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def check_bundle(bundle_path, manifest, name, source_paths=(), checksums=False):
+    """Problems that make the bundle unusable; an empty list if there are none."""
+    if manifest.get('format') != FORMAT_VERSION:
+        return [f"unsupported format {manifest.get('format')}"]
+    if manifest.get('model') != name:
+        return [f"built for {manifest.get('model')}"]
+    # Deployments may ship the bundle without the trained artifacts
+    if any(os.path.exists(path) for path in source_paths):
+        if artifact_fingerprint(*source_paths) != manifest.get('source_fingerprint'):
+            return ["the trained artifacts changed since it was built"]
+    problems = []
+    for relative, expected in manifest.get('files', {}).items():
+        path = os.path.join(bundle_path, relative)
+        if not os.path.isfile(path):
+            problems.append(f"{relative} is missing")
+        elif os.path.getsize(path) != expected['size']:
+            problems.append(f"{relative} has the wrong size")
+        elif checksums and file_sha256(path) != expected['sha256']:
+            problems.append(f"{relative} has the wrong checksum")
+    return problems
+
+
+def read_manifest(bundle_path):
+    try:
+        with open(os.path.join(bundle_path, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def open_bundle(bundle_path, name, source_paths, verify=MODEL_BUNDLE_VERIFY):
+    """Manifest of the model's bundle if it can be used, else None and the
+    caller loads the trained artifacts."""
+    if not MODEL_BUNDLES or not bundle_path:
+        return None
+    try:
+        manifest = read_manifest(bundle_path)
+    except ValueError as e:
+        print(f"Ignoring {name} bundle at {bundle_path}: unreadable manifest ({e})")
+        return None
+    if manifest is None:
+        return None
+    problems = check_bundle(bundle_path, manifest, name, source_paths, verify)
+    if problems:
+        print(f"Ignoring {name} bundle at {bundle_path}: {'; '.join(problems)}")
+        return None
+    return manifest
+
+
+def build_bert(paths, directory):
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    AutoTokenizer.from_pretrained(paths['model_path'], use_fast=True).save_pretrained(directory)
+    model = AutoModelForSequenceClassification.from_pretrained(paths['model_path'])
+    model.save_pretrained(directory, safe_serialization=True)
+    return {}
+
+
+def build_bilstm(paths, directory):
+    from keras.models import load_model as load_keras_model
+    from tensorflow.keras.preprocessing.text import tokenizer_from_json
+
+    from models.bilstm_fast import (VocabularyLookup, convert_to_tflite,
+                                    save_model_arrays)
+
+    with open(paths['tokenizer_path'], "r") as f:
+        tokenizer = tokenizer_from_json(f.read())
+    settings = VocabularyLookup.from_tokenizer(tokenizer).save_table(directory)
+    model = load_keras_model(paths['model_path'])
+    convert_to_tflite(model, os.path.join(directory, "model.tflite"))
+    return {'vocabulary': settings, 'keras': save_model_arrays(model, directory)}
+
+
+def build_xgboost(paths, directory):
+    import joblib
+    import xgboost as xgb
+
+    from models.tfidf_fast import CharNgramTfidf
+
+    booster = xgb.Booster()
+    booster.load_model(paths['model_path'])
+    booster.save_model(os.path.join(directory, "model.ubj"))
+    vectorizer = CharNgramTfidf.from_vectorizer(joblib.load(paths['tfidf_path']))
+    return {'tfidf': vectorizer.save_arrays(directory)}
+
+
+BUILDERS = {
+    'BERT': build_bert,
+    'BiLSTM': build_bilstm,
+    'XGBoost': build_xgboost,
+}
+
+
+def write_manifest(directory, name, source_paths, settings):
+    files = {}
+    for root, _, file_names in os.walk(directory):
+        for file_name in sorted(file_names):
+            path = os.path.join(root, file_name)
+            relative = os.path.relpath(path, directory).replace(os.sep, "/")
+            files[relative] = {'size': os.path.getsize(path), 'sha256': file_sha256(path)}
+    manifest = {
+        'format': FORMAT_VERSION,
+        'model': name,
+        'created': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'source_fingerprint': artifact_fingerprint(*source_paths),
+        'settings': settings,
+        'files': files,
+    }
+    with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def build_bundle(name, paths):
+    """Build the bundle of the artifacts in ``paths`` (load_model keyword
+    arguments) at ``paths['bundle_path']``, replacing any older one."""
+    bundle_path = paths['bundle_path']
+    source_paths = [paths[key] for key in SOURCE_ARTIFACTS[name]]
+    staging = bundle_path + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        settings = BUILDERS[name](paths, staging)
+        manifest = write_manifest(staging, name, source_paths, settings)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    previous = bundle_path + ".old"
+    if os.path.exists(bundle_path):
+        os.rename(bundle_path, previous)
+    os.rename(staging, bundle_path)
+    shutil.rmtree(previous, ignore_errors=True)
+    size_mb = sum(entry['size'] for entry in manifest['files'].values()) / 1e6
+    print(f"Built {name} bundle at {bundle_path} ({size_mb:.1f} MB)")
+    return manifest
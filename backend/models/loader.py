@@ -0,0 +1,248 @@
+import importlib
+import importlib.util
+import sys
+import threading
+import time
+
+from models import registry
+from models.process_pool import ProcessModelPool
+from utils import metrics
+from utils.config import MODEL_LOADING, MODEL_PROCESSES, MODEL_WARMUP
+
+# Model modules are only imported on load, so PyTorch, TensorFlow and
+# XGBoost are not initialized until a model is actually needed.
+MODEL_MODULES = {
+    'BERT': 'models.bert_model',
+    'BiLSTM': 'models.bilstm_model',
+    'XGBoost': 'models.xgboost_model',
+}
+WARMUP_MESSAGE = "Warmup message used to initialize the model before serving."
+
+_modules = {}
+_paths = {}
+_locks = {name: threading.Lock() for name in MODEL_MODULES}
+# Held while a new version is loaded next to the served one
+_reload_locks = {name: threading.Lock() for name in MODEL_MODULES}
+_status = {
+    name: {
+        'state': 'not_loaded',
+        'version': None,
+        'import_time_s': None,
+        'load_time_s': None,
+        'warmup_time_s': None,
+        'error': None,
+        'reloading': None,
+        'reload_error': None,
+    }
+    for name in MODEL_MODULES
+}
+
+
+def get_model(name):
+    """Return the loaded model module, loading it first if necessary."""
+    module = _modules.get(name)
+    if module is None:
+        module = load(name)
+    return module
+
+
+def loaded_version(name):
+    """Version of the loaded model, or None if it is not loaded yet."""
+    module = _modules.get(name)
+    return module.MODEL_VERSION if module is not None else None
+
+
+def artifact_paths(name):
+    """Artifacts the served model was loaded from."""
+    return _paths.get(name) or registry.artifact_paths(name)[1]
+
+
+def load(name, warmup=MODEL_WARMUP):
+    with _locks[name]:
+        if name in _modules:
+            return _modules[name]
+        status = _status[name]
+        status['state'] = 'loading'
+        status['error'] = None
+        try:
+            # The current registry version, or the configured paths if the
+            # model has never been published to the registry
+            version, paths = registry.artifact_paths(name)
+            if name in MODEL_PROCESSES:
+                # Worker processes import, load and warm up the model
+                start = time.perf_counter()
+                module = ProcessModelPool(name, version, MODEL_PROCESSES[name])
+                status['load_time_s'] = time.perf_counter() - start
+            else:
+                start = time.perf_counter()
+                module = importlib.import_module(MODEL_MODULES[name])
+                status['import_time_s'] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                module.load_model(**paths)
+                status['load_time_s'] = time.perf_counter() - start
+
+                if warmup:
+                    warm_up(name, module)
+        except Exception as e:
+            status['state'] = 'failed'
+            status['error'] = f"{type(e).__name__}: {e}"
+            print(f"Failed to load {name} model: {status['error']}")
+            raise
+        status['state'] = 'ready'
+        status['version'] = version
+        _paths[name] = paths
+        _modules[name] = module
+        for phase in ('import', 'load', 'warmup'):
+            metrics.record_model_load(name, phase, status[f'{phase}_time_s'])
+        print(f"{name} model ready (import {status['import_time_s'] or 0:.2f}s, "
+              f"load {status['load_time_s']:.2f}s)")
+        return module
+
+
+def load_module_instance(name, version=None):
+    """Load ``version`` (by default the current one) into a fresh instance of
+    the model module; returns (version, paths, module). Model modules keep
+    their state in module globals, so two versions need two instances."""
+    version, paths = registry.artifact_paths(name, version)
+    spec = importlib.util.find_spec(MODEL_MODULES[name])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.load_model(**paths)
+    return version, paths, module
+
+
+def reload(name, version=None):
+    """Load ``version`` (by default the current registry version) next to the
+    served model and swap it in.
+
+    The new version gets a fresh module instance, or new worker processes
+    for models in MODEL_PROCESSES. Requests resolve the model through
+    ``get_model`` on every call: those in flight finish on the old instance
+    and later ones use the new one. If loading fails, the old version keeps
+    serving and the error is recorded in ``reload_error``.
+    """
+    with _reload_locks[name]:
+        status = _status[name]
+        version, paths = registry.artifact_paths(name, version)
+        status['reloading'] = version
+        try:
+            start = time.perf_counter()
+            if name in MODEL_PROCESSES:
+                module = ProcessModelPool(name, version, MODEL_PROCESSES[name])
+                load_time_s = time.perf_counter() - start
+            else:
+                module = load_module_instance(name, version)[2]
+                load_time_s = time.perf_counter() - start
+                warm_up(name, module)
+        except Exception as e:
+            status['reload_error'] = {'version': version, 'error': f"{type(e).__name__}: {e}"}
+            print(f"Failed to load {name} version {version}: {status['reload_error']['error']}")
+            raise
+        finally:
+            status['reloading'] = None
+        with _locks[name]:
+            previous = _modules.get(name)
+            _modules[name] = module
+            _paths[name] = paths
+            if not isinstance(module, ProcessModelPool):
+                # Later imports get the new instance too, so nothing keeps
+                # the old one alive once the requests using it have finished
+                module_name = MODEL_MODULES[name]
+                package, _, attribute = module_name.rpartition('.')
+                sys.modules[module_name] = module
+                setattr(sys.modules[package], attribute, module)
+            status.update(state='ready', version=version, load_time_s=load_time_s,
+                          error=None, reload_error=None)
+        if isinstance(previous, ProcessModelPool):
+            # Waits for the batches still running on the old workers
+            threading.Thread(target=previous.close, name=f"model-{name}-close",
+                             daemon=True).start()
+        metrics.record_model_load(name, 'load', load_time_s)
+        print(f"{name} version {version} is now served (load {load_time_s:.2f}s)")
+        return module
+
+
+def start_reload(name, version=None):
+    thread = threading.Thread(target=_reload_quietly, args=(name, version),
+                              name=f"model-reload-{name}", daemon=True)
+    thread.start()
+    return thread
+
+
+def _reload_quietly(name, version=None):
+    try:
+        reload(name, version)
+    except Exception:
+        pass  # recorded in the status
+
+
+def watch_registry(interval_s, stopped=None):
+    """Reload a loaded model whenever the registry's current version changes,
+    e.g. after retraining.py published a new one or another worker process
+    rolled back. A version that failed to load is not retried."""
+    stopped = stopped or threading.Event()
+    while not stopped.wait(interval_s):
+        for name in MODEL_MODULES:
+            if name not in _modules:
+                continue
+            try:
+                current = registry.current_version(name)
+            except OSError:
+                continue
+            status = _status[name]
+            failed = status['reload_error'] or {}
+            if current is not None and current != status['version'] and current != failed.get('version'):
+                _reload_quietly(name, current)
+
+
+def start_registry_watcher(interval_s):
+    thread = threading.Thread(target=watch_registry, args=(interval_s,),
+                              name="model-registry-watcher", daemon=True)
+    thread.start()
+    return thread
+
+
+def close_process_pools():
+    for module in list(_modules.values()):
+        if isinstance(module, ProcessModelPool):
+            module.close()
+
+
+def warm_up(name, module=None):
+    # A dummy inference triggers graph building and kernel selection so the
+    # first real request does not pay for it.
+    module = module or _modules[name]
+    start = time.perf_counter()
+    module.analyze_messages([WARMUP_MESSAGE])
+    _status[name]['warmup_time_s'] = time.perf_counter() - start
+
+
+def load_all():
+    for name in MODEL_MODULES:
+        try:
+            load(name)
+        except Exception:
+            pass  # already recorded in the status and retried on next use
+    return is_ready()
+
+
+def start_background_loading(target=load_all):
+    thread = threading.Thread(target=target, name="model-loader", daemon=True)
+    thread.start()
+    return thread
+
+
+def is_ready():
+    # With lazy loading a model loads on its first request, and in tiered
+    # mode BERT may never be needed, so only loading or failed models count
+    ready_states = ('ready', 'not_loaded') if MODEL_LOADING == 'lazy' else ('ready',)
+    return all(status['state'] in ready_states for status in _status.values())
+
+
+def status():
+    result = {name: dict(model_status) for name, model_status in _status.items()}
+    for name, module in list(_modules.items()):
+        if isinstance(module, ProcessModelPool):
+            result[name]['processes'] = module.stats()
+    return result
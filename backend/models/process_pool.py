@@ -0,0 +1,328 @@
+import atexit
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from utils.config import (INTRA_OP_THREADS, MODEL_PROCESS_MAX_REQUESTS,
+                          MODEL_PROCESS_SHM_MB, MODEL_PROCESS_START_TIMEOUT_S,
+                          MODEL_PROCESS_THREADS, MODEL_PROCESS_TIMEOUT_S,
+                          MODEL_PROCESSES, MODEL_WARMUP)
+
+# Spawned rather than forked: the API process runs threads, and PyTorch,
+# TensorFlow and OpenMP are not fork-safe.
+_context = multiprocessing.get_context("spawn")
+
+
+class ModelWorkerError(RuntimeError):
+    """The model raised inside the worker; the worker itself is fine."""
+
+
+def process_threads():
+    if MODEL_PROCESS_THREADS > 0:
+        return MODEL_PROCESS_THREADS
+    total_replicas = sum(MODEL_PROCESSES.values()) or 1
+    return max(1, (INTRA_OP_THREADS or os.cpu_count() or 1) // total_replicas)
+
+
+# Batches in shared memory: the request is the int64 UTF-8 offsets of the
+# n messages followed by their bytes; the response overwrites it with n
+# float64 confidences followed by n int8 labels.
+
+def write_messages(buffer, messages):
+    """Copy ``messages`` into ``buffer``; False if they do not fit."""
+    encoded = [message.encode("utf-8", "surrogatepass") for message in messages]
+    count = len(encoded)
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    header = 8 * (count + 1)
+    end = header + int(offsets[-1])
+    if end > len(buffer) or 9 * count > len(buffer):
+        return False
+    buffer[:header] = offsets.tobytes()
+    buffer[header:end] = b"".join(encoded)
+    return True
+
+
+def read_messages(buffer, count):
+    offsets = np.frombuffer(buffer, dtype=np.int64, count=count + 1).tolist()
+    header = 8 * (count + 1)
+    data = bytes(buffer[header:header + offsets[-1]])
+    return [data[start:end].decode("utf-8", "surrogatepass")
+            for start, end in zip(offsets, offsets[1:])]
+
+
+def write_results(buffer, results):
+    count = len(results)
+    np.frombuffer(buffer, dtype=np.float64, count=count)[:] = [result[1] for result in results]
+    np.frombuffer(buffer, dtype=np.int8, count=count, offset=8 * count)[:] = [result[0] for result in results]
+
+
+def read_results(buffer, count):
+    confidences = np.frombuffer(buffer, dtype=np.float64, count=count).tolist()
+    labels = np.frombuffer(buffer, dtype=np.int8, count=count, offset=8 * count).tolist()
+    return list(zip(labels, confidences))
+
+
+def run_worker(name, version, conn, shm_name, threads):
+    """Entry point of a worker process: load one model and serve batches
+    sent over ``conn`` until told to stop or the API process goes away."""
+    # The API process stops its workers; Ctrl+C should not hit them first
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Must be set before the ML libraries are imported
+    os.environ["INTRA_OP_THREADS"] = str(threads)
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"):
+        os.environ[variable] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    import importlib
+
+    from utils import config
+    # Importing the API's main module may already have read the config with
+    # the API process's thread settings
+    importlib.reload(config)
+    from models import loader
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        try:
+            version, _, module = loader.load_module_instance(name, version)
+            if MODEL_WARMUP:
+                module.analyze_messages([loader.WARMUP_MESSAGE])
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+            return
+        conn.send(("ready", module.MODEL_VERSION))
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                return  # the API process exited
+            if request[0] == "stop":
+                return
+            try:
+                if request[0] == "shm":
+                    results = module.analyze_messages(read_messages(shm.buf, request[1]))
+                    write_results(shm.buf, results)
+                    conn.send(("ok", None))
+                else:
+                    conn.send(("ok", module.analyze_messages(request[1])))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        shm.close()
+
+
+class ModelWorker:
+    """One worker process and its pipe and shared memory block."""
+
+    def __init__(self, name, version, index, shm_bytes, threads):
+        self.name = name
+        self.version = version
+        self.index = index
+        self.threads = threads
+        self.shm = shared_memory.SharedMemory(create=True, size=shm_bytes)
+        self.process = None
+        self.conn = None
+        self.model_version = None
+        self.requests = 0
+        self.restarts = 0
+        self.inline_batches = 0
+
+    def spawn(self):
+        parent_conn, child_conn = _context.Pipe()
+        process = _context.Process(
+            target=run_worker, name=f"model-{self.name}-{self.index}", daemon=True,
+            args=(self.name, self.version, child_conn, self.shm.name, self.threads))
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def start(self, timeout=MODEL_PROCESS_START_TIMEOUT_S):
+        self.wait_ready(*self.spawn(), timeout)
+
+    def wait_ready(self, process, conn, timeout=MODEL_PROCESS_START_TIMEOUT_S):
+        try:
+            if not conn.poll(timeout):
+                raise TimeoutError(f"{self.name} worker did not start within {timeout}s")
+            status, payload = conn.recv()
+        except Exception:
+            process.kill()
+            conn.close()
+            raise
+        if status != "ready":
+            process.join(5)
+            conn.close()
+            raise ModelWorkerError(f"{self.name} worker failed to load: {payload}")
+        self.process, self.conn = process, conn
+        self.model_version = payload
+        self.requests = 0
+
+    def call(self, messages, timeout=MODEL_PROCESS_TIMEOUT_S):
+        if write_messages(self.shm.buf, messages):
+            self.conn.send(("shm", len(messages)))
+        else:
+            self.inline_batches += 1
+            self.conn.send(("inline", list(messages)))
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"{self.name} worker did not answer within {timeout}s")
+        status, payload = self.conn.recv()
+        self.requests += 1
+        if status == "error":
+            raise ModelWorkerError(payload)
+        return payload if payload is not None else read_results(self.shm.buf, len(messages))
+
+    def restart(self):
+        # Start the replacement first, so a recycled worker keeps its slot
+        # until the new one is ready; a crashed one is gone anyway.
+        old_process, old_conn = self.process, self.conn
+        self.wait_ready(*self.spawn())
+        self.restarts += 1
+        self._stop(old_process, old_conn)
+
+    def stop(self):
+        self._stop(self.process, self.conn)
+        self.process = self.conn = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def _stop(self, process, conn):
+        if process is None:
+            return
+        try:
+            conn.send(("stop",))
+        except OSError:
+            pass
+        process.join(5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        conn.close()
+
+    def stats(self):
+        return {
+            'pid': self.process.pid if self.process is not None else None,
+            'alive': self.process is not None and self.process.is_alive(),
+            'requests': self.requests,
+            'restarts': self.restarts,
+            'inline_batches': self.inline_batches,
+        }
+
+
+class ProcessModelPool:
+    """Stands in for a model module (see models/loader.py) and runs the
+    model in ``replicas`` worker processes.
+
+    Each call takes an idle replica, so up to ``replicas`` batches run in
+    parallel and further callers wait for one to free up. Batches move
+    through the replica's shared memory block; the pipe only carries small
+    control messages. A replica that crashes, hangs or reaches
+    ``MODEL_PROCESS_MAX_REQUESTS`` is replaced in the background. The
+    failed call raises, so the API reports the model as failed for it.
+    """
+
+    def __init__(self, name, version=None, replicas=1):
+        self.name = name
+        self.version = version
+        shm_bytes = max(1 << 16, int(MODEL_PROCESS_SHM_MB * (1 << 20)))
+        threads = process_threads()
+        self._workers = [ModelWorker(name, version, i, shm_bytes, threads)
+                         for i in range(replicas)]
+        self._idle = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        # Replicas load their models concurrently
+        spawned = [worker.spawn() for worker in self._workers]
+        try:
+            for worker, (process, conn) in zip(self._workers, spawned):
+                worker.wait_ready(process, conn)
+        except Exception:
+            for worker, (process, conn) in zip(self._workers, spawned):
+                worker._stop(process, conn)
+                worker.shm.close()
+                worker.shm.unlink()
+            raise
+        for worker in self._workers:
+            self._idle.put(worker)
+        self.MODEL_VERSION = self._workers[0].model_version
+        atexit.register(self.close)
+
+    def analyze_messages(self, messages):
+        messages = list(messages)
+        if not messages:
+            return []
+        try:
+            worker = self._idle.get(timeout=MODEL_PROCESS_TIMEOUT_S)
+        except queue.Empty:
+            raise TimeoutError(f"No {self.name} worker became available "
+                               f"within {MODEL_PROCESS_TIMEOUT_S}s") from None
+        replace = False
+        try:
+            results = worker.call(messages)
+            replace = bool(MODEL_PROCESS_MAX_REQUESTS) and worker.requests >= MODEL_PROCESS_MAX_REQUESTS
+            return results
+        except ModelWorkerError:
+            raise
+        except Exception as e:
+            # Crashed (e.g. killed for running out of memory), hung, or the
+            # batch failed on this side and the pipe may be out of step
+            print(f"{self.name} worker {worker.index} failed ({type(e).__name__}: {e}), restarting it")
+            replace = True
+            if isinstance(e, (EOFError, OSError, TimeoutError)):
+                raise ModelWorkerError(f"{self.name} worker failed: {e}") from e
+            raise
+        finally:
+            # Every path returns the replica or replaces it, or the pool shrinks
+            if replace:
+                self._replace(worker)
+            else:
+                self._idle.put(worker)
+
+    def analyze_message(self, message):
+        return self.analyze_messages([message])[0]
+
+    def _replace(self, worker):
+        threading.Thread(target=self._restart, args=(worker,),
+                         name=f"model-{self.name}-restart", daemon=True).start()
+
+    def _restart(self, worker, retry_delay_s=5):
+        while not self._closed:
+            try:
+                worker.restart()
+            except Exception as e:
+                print(f"Restarting {self.name} worker {worker.index} failed: {e}")
+                time.sleep(retry_delay_s)
+                continue
+            with self._lock:
+                if not self._closed:
+                    self._idle.put(worker)
+                    return
+            # close() ran while the replacement was starting and has already
+            # stopped this worker; do not leave its new process behind
+            worker._stop(worker.process, worker.conn)
+            worker.process = worker.conn = None
+            return
+
+    def close(self):
+        """Stop the workers, after letting in-flight batches finish."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        # Pools replaced by a reload would otherwise stay referenced until exit
+        atexit.unregister(self.close)
+        deadline = time.monotonic() + MODEL_PROCESS_TIMEOUT_S
+        for _ in self._workers:
+            try:
+                self._idle.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+        for worker in self._workers:
+            worker.stop()
+
+    def stats(self):
+        return [worker.stats() for worker in self._workers]
@@ -0,0 +1,200 @@
+import json
+import os
+import secrets
+import shutil
+from datetime import datetime, timezone
+
+from utils.config import (BERT_MODEL_PATH, BERT_ONNX_PATH, BILSTM_MODEL_PATH,
+                          BILSTM_TFLITE_PATH, BILSTM_TOKENIZER_PATH,
+                          MODEL_BUNDLE_DIR, MODEL_REGISTRY_DIR,
+                          MODEL_REGISTRY_KEEP, TFIDF_PATH, XGBOOST_MODEL_PATH)
+
+# Layout of the registry:
+#   <MODEL_REGISTRY_DIR>/<model>/versions/<version>/  artifacts of one version
+#   <MODEL_REGISTRY_DIR>/<model>/current              id of the served version
+# A version directory is complete before it is renamed into versions/, and
+# the pointer is replaced atomically, so a reader never sees a half-written
+# model.
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# load_model() keyword -> file name inside a version directory
+ARTIFACTS = {
+    'BERT': {'model_path': 'model', 'onnx_path': 'model.quant.onnx',
+             'bundle_path': 'bundle'},
+    'BiLSTM': {'model_path': 'model.h5', 'tokenizer_path': 'tokenizer.json',
+               'tflite_path': 'model.tflite', 'bundle_path': 'bundle'},
+    'XGBoost': {'model_path': 'model.json', 'tfidf_path': 'tfidf.joblib',
+                'bundle_path': 'bundle'},
+}
+# Built from the trained artifacts (export_bert_onnx.py, models/bundle.py,
+# or on first load for TFLite) rather than by retraining
+DERIVED_ARTIFACTS = ('onnx_path', 'tflite_path', 'bundle_path')
+# Flat artifact paths from the config, served while a model has no version
+LEGACY_PATHS = {
+    'BERT': {'model_path': BERT_MODEL_PATH, 'onnx_path': BERT_ONNX_PATH,
+             'bundle_path': os.path.join(MODEL_BUNDLE_DIR, 'BERT')},
+    'BiLSTM': {'model_path': BILSTM_MODEL_PATH, 'tokenizer_path': BILSTM_TOKENIZER_PATH,
+               'tflite_path': BILSTM_TFLITE_PATH,
+               'bundle_path': os.path.join(MODEL_BUNDLE_DIR, 'BiLSTM')},
+    'XGBoost': {'model_path': XGBOOST_MODEL_PATH, 'tfidf_path': TFIDF_PATH,
+                'bundle_path': os.path.join(MODEL_BUNDLE_DIR, 'XGBoost')},
+}
+
+METADATA_FILE = "metadata.json"
+STAGING_PREFIX = ".staging-"
+
+
+class UnknownVersion(ValueError):
+    pass
+
+
+def registry_dir():
+    return os.path.join(BACKEND_DIR, MODEL_REGISTRY_DIR)
+
+
+def model_dir(name):
+    if name not in ARTIFACTS:
+        raise KeyError(f"Unknown model: {name}")
+    return os.path.join(registry_dir(), name)
+
+
+def version_dir(name, version):
+    return os.path.join(model_dir(name), "versions", version)
+
+
+def version_paths(name, directory):
+    return {key: os.path.join(directory, file_name)
+            for key, file_name in ARTIFACTS[name].items()}
+
+
+def legacy_paths(name):
+    return {key: os.path.join(BACKEND_DIR, path)
+            for key, path in LEGACY_PATHS[name].items()}
+
+
+def current_version(name):
+    """Id of the version the pointer refers to, or None if there is none."""
+    try:
+        with open(os.path.join(model_dir(name), "current"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_current(name, version):
+    if not os.path.isdir(version_dir(name, version)):
+        raise UnknownVersion(f"{name} has no version {version}")
+    pointer = os.path.join(model_dir(name), "current")
+    temp_pointer = f"{pointer}.{os.getpid()}.tmp"
+    with open(temp_pointer, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_pointer, pointer)
+
+
+def list_versions(name):
+    """Published versions, oldest first. Ids start with a UTC timestamp, so
+    they sort chronologically."""
+    versions_dir = os.path.join(model_dir(name), "versions")
+    if not os.path.isdir(versions_dir):
+        return []
+    current = current_version(name)
+    versions = []
+    for version in sorted(os.listdir(versions_dir)):
+        if version.startswith(STAGING_PREFIX):
+            continue
+        try:
+            with open(os.path.join(versions_dir, version, METADATA_FILE), encoding="utf-8") as f:
+                metadata = json.load(f)
+        except (FileNotFoundError, ValueError):
+            metadata = {}
+        versions.append({**metadata, 'version': version, 'current': version == current})
+    return versions
+
+
+def previous_version(name):
+    """The version published before the current one, for rollbacks."""
+    versions = [entry['version'] for entry in list_versions(name)]
+    current = current_version(name)
+    if current not in versions:
+        return None
+    index = versions.index(current)
+    return versions[index - 1] if index > 0 else None
+
+
+def artifact_paths(name, version=None):
+    """(version, load_model keyword arguments) for ``version``, by default
+    the current one. Without any version the legacy paths are returned with
+    version None."""
+    version = version or current_version(name)
+    if version is None:
+        return None, legacy_paths(name)
+    directory = version_dir(name, version)
+    if not os.path.isdir(directory):
+        raise UnknownVersion(f"{name} has no version {version}")
+    return version, version_paths(name, directory)
+
+
+def staging_dir(name, version):
+    return os.path.join(model_dir(name), "versions", STAGING_PREFIX + version)
+
+
+def stage_version(name):
+    """Create an empty directory for a new version; returns (version, paths).
+    Write the artifacts to ``paths`` and then call ``publish``."""
+    # Microseconds keep versions published within one second in order
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ") + "-" + secrets.token_hex(3)
+    staging = staging_dir(name, version)
+    os.makedirs(staging)
+    return version, version_paths(name, staging)
+
+
+def discard(name, version):
+    shutil.rmtree(staging_dir(name, version), ignore_errors=True)
+
+
+def publish(name, version, metadata=None, activate=True):
+    """Move a staged version into place and, by default, make it current."""
+    metadata = {
+        'created': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'parent': current_version(name),
+        **(metadata or {}),
+    }
+    staging = staging_dir(name, version)
+    with open(os.path.join(staging, METADATA_FILE), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    os.rename(staging, version_dir(name, version))
+    if activate:
+        set_current(name, version)
+    prune(name)
+    print(f"Published {name} version {version}")
+    return version
+
+
+def import_legacy(name):
+    """Copy the flat artifacts from the config into the registry as its first
+    version, so the model that was served before can be rolled back to."""
+    if list_versions(name):
+        return None
+    version, paths = stage_version(name)
+    try:
+        for key, source in legacy_paths(name).items():
+            if os.path.isdir(source):
+                shutil.copytree(source, paths[key])
+            elif os.path.exists(source):
+                shutil.copy2(source, paths[key])
+    except Exception:
+        discard(name, version)
+        raise
+    return publish(name, version, {'source': 'legacy'})
+
+
+def prune(name, keep=MODEL_REGISTRY_KEEP):
+    """Delete the oldest versions beyond ``keep``, never the current one."""
+    versions = [entry['version'] for entry in list_versions(name)]
+    current = current_version(name)
+    for version in versions[:max(0, len(versions) - keep)]:
+        if version != current:
+            shutil.rmtree(version_dir(name, version), ignore_errors=True)
@@ -1,6 +1,4 @@
-import os
 import shutil
-import sqlite3
 import tempfile
 
 import joblib
@@ -15,54 +13,33 @@ from tensorflow.keras.preprocessing.sequence import pad_sequences
 from tensorflow.keras.preprocessing.text import tokenizer_from_json
 from transformers import (AutoModelForSequenceClassification, AutoTokenizer,
                           Trainer, TrainingArguments)
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from xgboost import XGBClassifier
 
-from utils.config import BERT_MODEL_PATH, BILSTM_MODEL_PATH, BILSTM_TOKENIZER_PATH, XGBOOST_MODEL_PATH, TFIDF_PATH
-import os
-
-# Update paths to include absolute path prefix
-ABS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-BERT_MODEL_PATH = os.path.join(ABS_PATH, BERT_MODEL_PATH)
-BILSTM_MODEL_PATH = os.path.join(ABS_PATH, BILSTM_MODEL_PATH)
-BILSTM_TOKENIZER_PATH = os.path.join(ABS_PATH, BILSTM_TOKENIZER_PATH)
-XGBOOST_MODEL_PATH = os.path.join(ABS_PATH, XGBOOST_MODEL_PATH)
-TFIDF_PATH = os.path.join(ABS_PATH, TFIDF_PATH)
+from database.database import engine
+from models import bundle, registry
 
 load_dotenv()
 
-DB_PATH = os.getenv(
-    "DB_FILE", "D:/Repos/Scamalyzer/backend/database/scamalyzer.db")
-ABS_PATH = os.getenv("ABS_PATH", os.path.abspath(
-    os.path.join(os.path.dirname(__file__), '..', '..')))
-
-
-def connect_to_db():
-    try:
-        return sqlite3.connect(DB_PATH)
-    except sqlite3.Error as e:
-        print(f"Error connecting to the database: {e}")
-        return None
-
 
 def fetch_verified_messages():
-    conn = connect_to_db()
-    if not conn:
-        return [], [], []
+    # Uses the API's engine (DATABASE_URL), so it reads the same database
+    # and, on SQLite, does not block the running server thanks to WAL.
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, content, 
-                   bert_label, bert_confidence, 
-                   bilstm_label, bilstm_confidence, 
-                   xgboost_label, xgboost_confidence
-            FROM messages
-            WHERE verified = 1 AND used_for_training = 0;
-        """)
-        rows = cursor.fetchall()
-        conn.close()
+        with engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT id, content,
+                       bert_label, bert_confidence,
+                       bilstm_label, bilstm_confidence,
+                       xgboost_label, xgboost_confidence,
+                       label
+                FROM messages
+                WHERE verified = :verified AND used_for_training = :used;
+            """), {"verified": True, "used": False}).fetchall()
         print(f"Fetched {len(rows)} verified messages for retraining.")
         return process_message_rows(rows)
-    except sqlite3.Error as e:
+    except SQLAlchemyError as e:
         print(f"Error accessing the database: {e}")
         return [], [], []
 
@@ -75,29 +52,32 @@ def process_message_rows(rows):
 
 
 def get_highest_confidence_label(row):
+    # A label set by a moderator is ground truth
+    if row[8] is not None:
+        return int(row[8])
     confidences = {
         "bert": row[3],
         "bilstm": row[5],
         "xgboost": row[7]
     }
+    # Models skipped by the tiered analysis mode have no confidence
+    confidences = {model: confidence for model, confidence in confidences.items()
+                   if confidence is not None}
     highest_model = max(confidences, key=confidences.get)
     return int(row[2] if highest_model == "bert" else row[4] if highest_model == "bilstm" else row[6])
 
 
 def mark_messages_as_used(message_ids):
-    conn = connect_to_db()
-    if not conn:
+    if not message_ids:
         return
     try:
-        cursor = conn.cursor()
-        cursor.executemany("""
-            UPDATE messages
-            SET used_for_training = 1
-            WHERE id = ?;
-        """, [(message_id,) for message_id in message_ids])
-        conn.commit()
-        conn.close()
-    except sqlite3.Error as e:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                UPDATE messages
+                SET used_for_training = :used
+                WHERE id = :id;
+            """), [{"used": True, "id": message_id} for message_id in message_ids])
+    except SQLAlchemyError as e:
         print(f"Error updating the database: {e}")
 
 
@@ -105,27 +85,46 @@ def retrain_model(model_name, retrain_function, texts, labels):
     if not texts:
         print(f"No new verified messages for {model_name} retraining.")
         return
-    retrain_function(texts, labels)
-    print(f"{model_name} model retrained successfully.")
+    # Never overwrite served artifacts: train from the current version into
+    # a new one and publish it, so the API can swap it in and roll it back.
+    # The first run copies the configured artifacts in as the base version.
+    registry.import_legacy(model_name)
+    base_version, base_paths = registry.artifact_paths(model_name)
+    version, output_paths = registry.stage_version(model_name)
+    try:
+        retrain_function(texts, labels, base_paths, output_paths)
+    except Exception:
+        registry.discard(model_name, version)
+        raise
+    try:
+        bundle.build_bundle(model_name, output_paths)
+    except Exception as e:
+        # The version still works from its trained artifacts, only slower to load
+        print(f"Could not build the {model_name} bundle: {e}")
+    registry.publish(model_name, version, {'source': 'retraining', 'messages': len(texts)})
+    print(f"{model_name} model retrained successfully (version {version}, "
+          f"based on {base_version}).")
 
 
-def retrain_bert(texts, labels):
-    tokenizer = AutoTokenizer.from_pretrained(BERT_MODEL_PATH)
+def retrain_bert(texts, labels, base_paths, output_paths):
+    tokenizer = AutoTokenizer.from_pretrained(base_paths["model_path"])
     train_ds = prepare_dataset(texts, labels, tokenizer)
     model = AutoModelForSequenceClassification.from_pretrained(
-        BERT_MODEL_PATH, num_labels=2)
-    args = TrainingArguments(
-        output_dir=BERT_MODEL_PATH,
-        learning_rate=2e-5,
-        per_device_train_batch_size=16,
-        num_train_epochs=2,
-        weight_decay=0.01,
-        save_total_limit=2,
-    )
-    trainer = Trainer(model=model, args=args,
-                      train_dataset=train_ds, tokenizer=tokenizer)
-    trainer.train()
-    save_model_and_tokenizer(trainer, tokenizer, BERT_MODEL_PATH)
+        base_paths["model_path"], num_labels=2)
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        args = TrainingArguments(
+            output_dir=checkpoint_dir,
+            learning_rate=2e-5,
+            per_device_train_batch_size=16,
+            num_train_epochs=2,
+            weight_decay=0.01,
+            save_total_limit=2,
+        )
+        trainer = Trainer(model=model, args=args,
+                          train_dataset=train_ds, tokenizer=tokenizer)
+        trainer.train()
+    trainer.save_model(output_paths["model_path"])
+    tokenizer.save_pretrained(output_paths["model_path"])
 
 
 def prepare_dataset(texts, labels, tokenizer):
@@ -137,29 +136,21 @@ def prepare_dataset(texts, labels, tokenizer):
     return train_ds
 
 
-def save_model_and_tokenizer(trainer, tokenizer, model_path):
-    with tempfile.TemporaryDirectory() as temp_dir:
-        trainer.save_model(temp_dir)
-        tokenizer.save_pretrained(temp_dir)
-        if os.path.exists(model_path):
-            shutil.rmtree(model_path)
-        shutil.move(temp_dir, model_path)
-
-
-def retrain_bilstm(texts, labels):
+def retrain_bilstm(texts, labels, base_paths, output_paths):
     tf.config.run_functions_eagerly(True)
-    tokenizer = load_bilstm_tokenizer()
+    tokenizer = load_bilstm_tokenizer(base_paths["tokenizer_path"])
     X_new_train = prepare_bilstm_texts(texts, tokenizer)
     y_new_train = np.array(labels)
-    model = load_model(BILSTM_MODEL_PATH)
+    model = load_model(base_paths["model_path"])
     model.compile(loss="binary_crossentropy",
                   optimizer="adam", metrics=["accuracy"])
     model.fit(X_new_train, y_new_train, batch_size=64, epochs=2)
-    model.save(BILSTM_MODEL_PATH)
+    model.save(output_paths["model_path"])
+    shutil.copy2(base_paths["tokenizer_path"], output_paths["tokenizer_path"])
 
 
-def load_bilstm_tokenizer():
-    with open(BILSTM_TOKENIZER_PATH, "r") as f:
+def load_bilstm_tokenizer(tokenizer_path):
+    with open(tokenizer_path, "r") as f:
         tokenizer_json = f.read()
     return tokenizer_from_json(tokenizer_json)
 
@@ -169,13 +160,17 @@ def prepare_bilstm_texts(texts, tokenizer):
     return pad_sequences(seqs, maxlen=200, padding="post", truncating="post")
 
 
-def retrain_xgboost(texts, labels):
-    tfidf = joblib.load(TFIDF_PATH)
+def retrain_xgboost(texts, labels, base_paths, output_paths):
+    tfidf = joblib.load(base_paths["tfidf_path"])
     X_new_train, y_new_train = prepare_xgboost_data(texts, labels, tfidf)
-    model = joblib.load(XGBOOST_MODEL_PATH)
-    model.fit(X_new_train, y_new_train)
-    joblib.dump(model, XGBOOST_MODEL_PATH)
-    joblib.dump(tfidf, TFIDF_PATH)
+    # The served model is saved in XGBoost's JSON format (see xgboost_model.py)
+    model = XGBClassifier()
+    model.load_model(base_paths["model_path"])
+    # Continue boosting from the base version, like BERT and the BiLSTM
+    # fine-tune theirs, rather than fitting a new model on the new messages only
+    model.fit(X_new_train, y_new_train, xgb_model=model.get_booster())
+    model.save_model(output_paths["model_path"])
+    shutil.copy2(base_paths["tfidf_path"], output_paths["tfidf_path"])
 
 
 def prepare_xgboost_data(texts, labels, tfidf):
@@ -0,0 +1,143 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class CharNgramTfidf:
+    """Fast drop-in for ``TfidfVectorizer.transform`` with ``analyzer="char_wb"``.
+
+    ``char_wb`` n-grams never cross word boundaries, so the columns a word
+    contributes depend only on the word itself. They are computed once per
+    distinct word against the fitted n-gram -> column index and memoized as
+    small arrays. Vectorizing a message is then one cached lookup per word,
+    and the per-column counting happens in scipy instead of a Python loop
+    over every n-gram. The output matches ``tfidf.transform`` (see
+    models/training/check_tfidf_parity.py).
+    """
+
+    def __init__(self, vocabulary, idf, ngram_range, lowercase=True,
+                 binary=False, sublinear_tf=False, norm="l2",
+                 word_cache_size=200000):
+        self.vocabulary = vocabulary
+        self.idf = None if idf is None else np.asarray(idf, dtype=np.float64)
+        self.min_n, self.max_n = ngram_range
+        self.lowercase = lowercase
+        self.binary = binary
+        self.sublinear_tf = sublinear_tf
+        self.norm = norm
+        self.n_features = len(vocabulary)
+        self._word_columns = lru_cache(maxsize=word_cache_size)(self._compute_word_columns)
+
+    @classmethod
+    def from_vectorizer(cls, tfidf, word_cache_size=200000):
+        if (tfidf.analyzer != "char_wb" or tfidf.preprocessor is not None
+                or tfidf.strip_accents is not None or tfidf.input != "content"):
+            raise ValueError("Only plain char_wb TF-IDF vectorizers are supported")
+        return cls(tfidf.vocabulary_, tfidf.idf_ if tfidf.use_idf else None,
+                   tfidf.ngram_range, tfidf.lowercase, tfidf.binary,
+                   tfidf.sublinear_tf, tfidf.norm, word_cache_size)
+
+    def save_arrays(self, directory):
+        """Write the vocabulary and idf as .npy arrays; returns the settings
+        ``load_arrays`` needs. Loading them avoids unpickling the fitted
+        vectorizer, whose ``stop_words_`` alone can hold millions of pruned
+        n-grams."""
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        np.save(os.path.join(directory, "tfidf_terms.npy"), np.array(terms, dtype=str))
+        if self.idf is not None:
+            np.save(os.path.join(directory, "tfidf_idf.npy"), self.idf)
+        return {
+            'ngram_range': [self.min_n, self.max_n],
+            'lowercase': self.lowercase,
+            'binary': self.binary,
+            'sublinear_tf': self.sublinear_tf,
+            'norm': self.norm,
+            'use_idf': self.idf is not None,
+        }
+
+    @classmethod
+    def load_arrays(cls, directory, settings, word_cache_size=200000):
+        # Terms are stored in column order; the idf is memory-mapped
+        terms = np.load(os.path.join(directory, "tfidf_terms.npy"))
+        vocabulary = {term: column for column, term in enumerate(terms.tolist())}
+        idf = None
+        if settings['use_idf']:
+            idf = np.load(os.path.join(directory, "tfidf_idf.npy"), mmap_mode="r")
+        return cls(vocabulary, idf, tuple(settings['ngram_range']), settings['lowercase'],
+                   settings['binary'], settings['sublinear_tf'], settings['norm'],
+                   word_cache_size)
+
+    def _compute_word_columns(self, word):
+        # Same n-gram enumeration as sklearn's _char_wb_ngrams
+        vocabulary = self.vocabulary
+        w = " " + word + " "
+        w_len = len(w)
+        counts = {}
+        for n in range(self.min_n, self.max_n + 1):
+            offset = 0
+            column = vocabulary.get(w[offset:offset + n])
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+            while offset + n < w_len:
+                offset += 1
+                column = vocabulary.get(w[offset:offset + n])
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+            if offset == 0:  # a short word (w_len < n) is counted only once
+                break
+        return (np.fromiter(counts.keys(), dtype=np.int32, count=len(counts)),
+                np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+
+    def transform(self, texts):
+        column_chunks = []
+        count_chunks = []
+        indptr = [0]
+        for text in texts:
+            if self.lowercase:
+                text = text.lower()
+            nnz = indptr[-1]
+            for word in text.split():
+                columns, counts = self._word_columns(word)
+                column_chunks.append(columns)
+                count_chunks.append(counts)
+                nnz += len(columns)
+            indptr.append(nnz)
+
+        if column_chunks:
+            indices = np.concatenate(column_chunks)
+            data = np.concatenate(count_chunks)
+        else:
+            indices = np.zeros(0, dtype=np.int32)
+            data = np.zeros(0, dtype=np.float64)
+        matrix = csr_matrix((data, indices, np.asarray(indptr, dtype=np.int64)),
+                            shape=(len(texts), self.n_features))
+        # Repeated words contribute the same columns more than once; summing
+        # duplicates also sorts the indices like sklearn's output.
+        matrix.sum_duplicates()
+
+        if self.binary:
+            matrix.data.fill(1)
+        if self.sublinear_tf:
+            np.log(matrix.data, matrix.data)
+            matrix.data += 1
+        if self.idf is not None:
+            matrix.data *= self.idf[matrix.indices]
+        if self.norm is not None:
+            self._normalize(matrix)
+        return matrix
+
+    def _normalize(self, matrix):
+        row_lengths = np.diff(matrix.indptr)
+        rows = np.repeat(np.arange(matrix.shape[0]), row_lengths)
+        if self.norm == "l2":
+            row_norms = np.sqrt(np.bincount(
+                rows, weights=matrix.data ** 2, minlength=matrix.shape[0]))
+        elif self.norm == "l1":
+            row_norms = np.bincount(
+                rows, weights=np.abs(matrix.data), minlength=matrix.shape[0])
+        else:
+            raise ValueError(f"Unsupported norm: {self.norm}")
+        row_norms[row_norms == 0] = 1.0
+        matrix.data /= row_norms[rows]
@@ -0,0 +1,61 @@
+# build_bundle.py
+# Converts the trained artifacts into fast-loading bundles (see
+# models/bundle.py) that the model modules load instead when present:
+# safetensors BERT weights, the XGBoost booster in binary form, the TF-IDF
+# vocabulary as arrays and the BiLSTM tokenizer as a binary lookup table.
+# Each bundle gets a manifest with the size and SHA-256 of its files.
+#
+# Usage (from the backend directory):
+#   python -m models.training.build_bundle                    # every model
+#   python -m models.training.build_bundle --models XGBoost --version <registry version>
+#   python -m models.training.build_bundle --verify           # check existing bundles
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from models import registry
+from models.bundle import (BUILDERS, SOURCE_ARTIFACTS, build_bundle,
+                           check_bundle, read_manifest)
+
+
+def verify(name, paths):
+    manifest = read_manifest(paths['bundle_path'])
+    if manifest is None:
+        print(f"  [SKIP] {name}: no bundle at {paths['bundle_path']}")
+        return True
+    sources = [paths[key] for key in SOURCE_ARTIFACTS[name]]
+    problems = check_bundle(paths['bundle_path'], manifest, name, sources, checksums=True)
+    for problem in problems:
+        print(f"  [FAIL] {name}: {problem}")
+    if not problems:
+        print(f"  [OK] {name}: {len(manifest['files'])} files match the manifest")
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or verify fast-loading model bundles.")
+    parser.add_argument("--models", default=",".join(BUILDERS),
+                        help="Comma-separated models (default: all)")
+    parser.add_argument("--version",
+                        help="Registry version to bundle (default: the current one, "
+                             "or the configured paths if the model has none)")
+    parser.add_argument("--verify", action="store_true",
+                        help="Check existing bundles against their manifests instead")
+    args = parser.parse_args()
+
+    ok = True
+    for name in [name.strip() for name in args.models.split(",") if name.strip()]:
+        version, paths = registry.artifact_paths(name, args.version)
+        if args.verify:
+            ok = verify(name, paths) and ok
+            continue
+        print(f"Bundling {name} ({f'version {version}' if version else 'configured paths'})")
+        build_bundle(name, paths)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
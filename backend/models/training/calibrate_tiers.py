@@ -0,0 +1,118 @@
+# calibrate_tiers.py
+# Calibrates the uncertainty band of the tiered analysis mode offline from the
+# messages table. For every candidate [TIER_LOW, TIER_HIGH] band it replays
+# the stored full analyses as if they had been scored in tiered mode and
+# reports how often BERT would run, the relative model cost and how often the
+# tiered answer agrees with the full ensemble's best label.
+#
+# Usage (from the backend directory):
+#   python -m models.training.calibrate_tiers --target-agreement 0.99
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import numpy as np
+
+from database.database import Message, SessionLocal
+from utils.config import TIER_MODELS
+from utils.tiering import is_uncertain
+
+
+def load_full_analyses():
+    db = SessionLocal()
+    try:
+        rows = db.query(Message).filter(
+            Message.bert_confidence.isnot(None),
+            Message.bilstm_confidence.isnot(None),
+            Message.xgboost_confidence.isnot(None)).all()
+        return [{
+            'BERT': (int(row.bert_label), row.bert_confidence),
+            'BiLSTM': (int(row.bilstm_label), row.bilstm_confidence),
+            'XGBoost': (int(row.xgboost_label), row.xgboost_confidence),
+        } for row in rows]
+    finally:
+        db.close()
+
+
+def best_label(analysis_results):
+    return max(analysis_results.values(), key=lambda result: result[1])[0]
+
+
+def evaluate_band(analyses, low, high, costs):
+    agree = 0
+    bert_runs = 0
+    for analysis_results in analyses:
+        tiers = {name: analysis_results[name] for name in TIER_MODELS}
+        if is_uncertain(tiers.values(), low, high):
+            bert_runs += 1
+            tiers['BERT'] = analysis_results['BERT']
+        agree += best_label(tiers) == best_label(analysis_results)
+    total = len(analyses)
+    full_cost = sum(costs.values())
+    tier_cost = sum(costs[name] for name in TIER_MODELS)
+    bert_rate = bert_runs / total
+    return {
+        'low': round(low, 2),
+        'high': round(high, 2),
+        'agreement': agree / total,
+        'bert_rate': bert_rate,
+        'relative_cost': (tier_cost + bert_rate * costs['BERT']) / full_cost,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Calibrate TIER_LOW/TIER_HIGH from stored analyses.")
+    parser.add_argument("--target-agreement", type=float, default=0.99)
+    parser.add_argument("--step", type=float, default=0.05)
+    parser.add_argument("--bert-cost", type=float, default=10.0)
+    parser.add_argument("--bilstm-cost", type=float, default=2.0)
+    parser.add_argument("--xgboost-cost", type=float, default=1.0)
+    parser.add_argument("--output", help="write the full report as JSON")
+    args = parser.parse_args()
+
+    analyses = load_full_analyses()
+    if not analyses:
+        print("No fully analyzed messages in the database.")
+        sys.exit(1)
+    costs = {'BERT': args.bert_cost, 'BiLSTM': args.bilstm_cost,
+             'XGBoost': args.xgboost_cost}
+
+    report = [
+        evaluate_band(analyses, low, high, costs)
+        for low in np.arange(0.0, 0.5 + 1e-9, args.step)
+        for high in np.arange(0.5, 1.0 + 1e-9, args.step)
+    ]
+    report.sort(key=lambda band: (band['relative_cost'], -band['agreement']))
+
+    print(f"Calibrated on {len(analyses)} messages (tiers: {', '.join(TIER_MODELS)})\n")
+    print(f"{'low':>5} {'high':>5} {'agreement':>10} {'bert_rate':>10} {'cost':>6}")
+    # Pareto front: each row is cheaper than every more accurate row after it
+    best_agreement = -1.0
+    for band in sorted(report, key=lambda band: band['relative_cost']):
+        if band['agreement'] > best_agreement:
+            best_agreement = band['agreement']
+            print(f"{band['low']:>5.2f} {band['high']:>5.2f} {band['agreement']:>10.4f} "
+                  f"{band['bert_rate']:>10.2%} {band['relative_cost']:>6.2f}")
+
+    candidates = [band for band in report if band['agreement'] >= args.target_agreement]
+    if candidates:
+        chosen = candidates[0]
+        print(f"\nRecommended: TIER_LOW={chosen['low']} TIER_HIGH={chosen['high']} "
+              f"(agreement {chosen['agreement']:.4f}, BERT on {chosen['bert_rate']:.1%}, "
+              f"cost {chosen['relative_cost']:.2f}x of full)")
+    else:
+        print(f"\nNo band reaches {args.target_agreement} agreement; keep ANALYSIS_MODE=full")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({'messages': len(analyses), 'tiers': TIER_MODELS,
+                       'costs': costs, 'bands': report}, f, indent=2)
+        print(f"  [OK] Saved report to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# check_bilstm_parity.py
+# Checks that the precompiled vocabulary lookup produces exactly the same
+# padded sequences as the Keras tokenizer, and compares the probabilities of
+# the fast BiLSTM engines with keras model.predict on the held-out split.
+#
+# Usage (from the backend directory):
+#   python -m models.training.check_bilstm_parity --samples 500
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import numpy as np
+import pandas as pd
+from keras.models import load_model
+from keras.preprocessing.sequence import pad_sequences
+from sklearn.model_selection import train_test_split
+from tensorflow.keras.preprocessing.text import tokenizer_from_json
+
+from models.bilstm_fast import VocabularyLookup, create_engine
+from utils.config import (BILSTM_MODEL_PATH, BILSTM_TFLITE_PATH,
+                          BILSTM_TOKENIZER_PATH, FINAL_DATASET_PATH)
+
+SEED = 42
+MAX_LEN = 200
+
+
+def load_holdout_texts(n_samples):
+    df = pd.read_csv(FINAL_DATASET_PATH)
+    df = df.dropna(subset=["message", "label"])
+    df["label"] = df["label"].astype(int)
+    _, test_df = train_test_split(
+        df, test_size=0.2, stratify=df["label"], random_state=SEED)
+    return test_df["message"].astype(str).tolist()[:n_samples]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check the fast BiLSTM path against Keras.")
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--engines", nargs="+", default=["function", "tflite"])
+    parser.add_argument("--tolerance", type=float, default=1e-4)
+    args = parser.parse_args()
+
+    texts = load_holdout_texts(args.samples)
+    with open(BILSTM_TOKENIZER_PATH, "r") as f:
+        tokenizer = tokenizer_from_json(f.read())
+    model = load_model(BILSTM_MODEL_PATH)
+
+    expected = pad_sequences(tokenizer.texts_to_sequences(texts), maxlen=MAX_LEN,
+                             padding="post", truncating="post")
+    actual = VocabularyLookup.from_tokenizer(tokenizer).encode_batch(texts, MAX_LEN)
+    mismatched = int((expected != actual).any(axis=1).sum())
+    print(f"Sequences: {len(texts) - mismatched}/{len(texts)} identical")
+
+    reference = model.predict(expected)[:, 0]
+    failed = mismatched > 0
+    for name in args.engines:
+        engine = create_engine(name, model, MAX_LEN, BILSTM_MODEL_PATH,
+                               BILSTM_TFLITE_PATH)
+        probs = engine.predict(actual)
+        delta = np.abs(probs - reference)
+        agreement = float(((probs > 0.5) == (reference > 0.5)).mean())
+        print(f"{name}: label agreement {agreement:.4f}, "
+              f"max probability delta {delta.max():.2e}")
+        failed = failed or delta.max() > args.tolerance
+
+    if failed:
+        print("  [FAIL] Fast BiLSTM path differs from Keras")
+        sys.exit(1)
+    print("  [OK] Fast BiLSTM path matches Keras")
+
+
+if __name__ == "__main__":
+    main()
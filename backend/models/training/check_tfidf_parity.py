@@ -0,0 +1,76 @@
+# check_tfidf_parity.py
+# Checks the fast XGBoost serving path against the reference one on the
+# training corpus: CharNgramTfidf.transform against tfidf.transform, and
+# Booster.inplace_predict against predict on a DMatrix. Also times both.
+#
+# Usage (from the backend directory):
+#   python -m models.training.check_tfidf_parity --samples 20000
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from models.tfidf_fast import CharNgramTfidf
+from utils.config import FINAL_DATASET_PATH, TFIDF_PATH, XGBOOST_MODEL_PATH
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check the fast TF-IDF and XGBoost path against sklearn.")
+    parser.add_argument("--samples", type=int, default=0,
+                        help="number of corpus rows to check (0 = all)")
+    parser.add_argument("--tolerance", type=float, default=1e-9)
+    args = parser.parse_args()
+
+    df = pd.read_csv(FINAL_DATASET_PATH).dropna(subset=["message"])
+    texts = df["message"].astype(str).tolist()
+    if args.samples:
+        texts = texts[:args.samples]
+
+    tfidf = joblib.load(TFIDF_PATH)
+    fast = CharNgramTfidf.from_vectorizer(tfidf)
+    expected, sklearn_time = timed(tfidf.transform, texts)
+    actual, fast_time = timed(fast.transform, texts)
+
+    same_structure = (expected.shape == actual.shape
+                      and np.array_equal(expected.indptr, actual.indptr)
+                      and np.array_equal(expected.indices, actual.indices))
+    max_delta = float(np.abs(expected.data - actual.data).max()) if same_structure else float("inf")
+    print(f"TF-IDF: {len(texts)} rows, identical sparsity: {same_structure}, "
+          f"max value delta: {max_delta:.2e}")
+    print(f"  sklearn transform: {sklearn_time:.2f}s, fast transform: {fast_time:.2f}s")
+
+    _, single_sklearn = timed(lambda: [tfidf.transform([t]) for t in texts[:1000]])
+    _, single_fast = timed(lambda: [fast.transform([t]) for t in texts[:1000]])
+    print(f"  single-message (first 1000): sklearn {single_sklearn:.2f}s, "
+          f"fast {single_fast:.2f}s")
+
+    booster = xgb.Booster()
+    booster.load_model(XGBOOST_MODEL_PATH)
+    reference, dmatrix_time = timed(lambda: booster.predict(xgb.DMatrix(expected)))
+    inplace, inplace_time = timed(booster.inplace_predict, actual)
+    prob_delta = float(np.abs(reference - inplace).max())
+    print(f"XGBoost: max probability delta {prob_delta:.2e}, "
+          f"DMatrix predict {dmatrix_time:.2f}s, inplace predict {inplace_time:.2f}s")
+
+    if not same_structure or max_delta > args.tolerance or prob_delta > 1e-6:
+        print("  [FAIL] Fast XGBoost path differs from the reference")
+        sys.exit(1)
+    print("  [OK] Fast XGBoost path matches the reference")
+
+
+if __name__ == "__main__":
+    main()
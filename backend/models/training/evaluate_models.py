@@ -17,6 +17,7 @@ from sklearn.metrics import (accuracy_score, confusion_matrix, f1_score,
 from sklearn.model_selection import train_test_split
 from transformers import AutoModelForSequenceClassification, AutoTokenizer
 
+from utils.bucketing import PaddingStats, length_buckets
 from utils.config import FINAL_DATASET_PATH
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -54,18 +55,24 @@ bert_model.eval()
 
 
 def bert_predict(texts, batch_size=32):
-    preds = []
-    for i in range(0, len(texts), batch_size):
-        print(
-            f"BERT: Predicting batch {i//batch_size + 1}/{(len(texts)-1)//batch_size + 1}")
-        batch_texts = texts[i:i+batch_size]
-        inputs = bert_tokenizer(
-            batch_texts, truncation=True, padding=True, max_length=256, return_tensors="pt")
+    # Sort into length buckets so each batch is only padded to its own
+    # longest sequence, then restore the original order.
+    encoded = bert_tokenizer(texts, truncation=True, max_length=256)
+    lengths = [len(ids) for ids in encoded["input_ids"]]
+    buckets = length_buckets(lengths, batch_size)
+    stats = PaddingStats()
+    preds = np.zeros(len(texts), dtype=int)
+    for n, bucket in enumerate(buckets):
+        print(f"BERT: Predicting batch {n + 1}/{len(buckets)}")
+        features = [{key: encoded[key][i] for key in encoded.keys()}
+                    for i in bucket]
+        inputs = bert_tokenizer.pad(features, return_tensors="pt")
         with torch.no_grad():
             outputs = bert_model(**inputs)
-        batch_preds = torch.argmax(outputs.logits, dim=1).cpu().numpy()
-        preds.extend(batch_preds)
-    return np.array(preds)
+        preds[bucket] = torch.argmax(outputs.logits, dim=1).cpu().numpy()
+        stats.record([lengths[i] for i in bucket])
+    print(f"BERT: padding ratio {stats.stats()['padding_ratio']:.2%}")
+    return preds
 
 
 start = time.time()
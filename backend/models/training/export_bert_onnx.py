@@ -0,0 +1,149 @@
+# export_bert_onnx.py
+# Exports the fine-tuned DistilBERT classifier to ONNX, applies INT8 dynamic
+# quantization and checks the quantized graph against the PyTorch model on
+# the held-out test split.
+#
+# Usage (from the backend directory):
+#   python -m models.training.export_bert_onnx --samples 500
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import numpy as np
+import onnxruntime as ort
+import pandas as pd
+import torch
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from sklearn.model_selection import train_test_split
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+from utils.config import BERT_MODEL_PATH, BERT_ONNX_PATH, FINAL_DATASET_PATH
+
+SEED = 42
+MAX_LEN = 256
+OPSET = 14
+
+
+class LogitsOnly(torch.nn.Module):
+    """Wraps the classifier so the exported graph has a single logits output."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+def export_onnx(model_path, fp32_path):
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+    sample = tokenizer(["Export sample message"], return_tensors="pt")
+    torch.onnx.export(
+        LogitsOnly(model),
+        (sample["input_ids"], sample["attention_mask"]),
+        fp32_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"},
+        },
+        opset_version=OPSET,
+    )
+    print(f"  [OK] Exported FP32 graph to: {fp32_path}")
+
+
+def quantize(fp32_path, quant_path):
+    quantize_dynamic(fp32_path, quant_path, weight_type=QuantType.QInt8)
+    fp32_mb = os.path.getsize(fp32_path) / 2**20
+    quant_mb = os.path.getsize(quant_path) / 2**20
+    print(f"  [OK] Quantized graph saved to: {quant_path} "
+          f"({fp32_mb:.1f} MB -> {quant_mb:.1f} MB)")
+
+
+def load_holdout_texts(n_samples):
+    # Same split as train_bert.py / evaluate_models.py
+    df = pd.read_csv(FINAL_DATASET_PATH)
+    df = df.dropna(subset=["message", "label"])
+    df["label"] = df["label"].astype(int)
+    _, test_df = train_test_split(
+        df, test_size=0.2, stratify=df["label"], random_state=SEED)
+    return test_df["message"].astype(str).tolist()[:n_samples]
+
+
+def softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def check_parity(model_path, onnx_path, texts, batch_size=32):
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+    session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+
+    torch_probs, onnx_probs = [], []
+    for i in range(0, len(texts), batch_size):
+        batch = texts[i:i + batch_size]
+        inputs = tokenizer(batch, truncation=True, padding=True,
+                           max_length=MAX_LEN, return_tensors="pt")
+        with torch.no_grad():
+            torch_probs.append(torch.softmax(model(**inputs).logits, dim=1).numpy())
+        logits = session.run(["logits"], {
+            "input_ids": inputs["input_ids"].numpy().astype(np.int64),
+            "attention_mask": inputs["attention_mask"].numpy().astype(np.int64),
+        })[0]
+        onnx_probs.append(softmax(logits))
+
+    torch_probs = np.concatenate(torch_probs)
+    onnx_probs = np.concatenate(onnx_probs)
+    torch_labels = (torch_probs[:, 1] > 0.5).astype(int)
+    onnx_labels = (onnx_probs[:, 1] > 0.5).astype(int)
+    deltas = np.abs(torch_probs[:, 1] - onnx_probs[:, 1])
+    report = {
+        "samples": len(texts),
+        "label_agreement": float((torch_labels == onnx_labels).mean()),
+        "disagreements": int((torch_labels != onnx_labels).sum()),
+        "mean_confidence_delta": float(deltas.mean()),
+        "p99_confidence_delta": float(np.percentile(deltas, 99)),
+        "max_confidence_delta": float(deltas.max()),
+    }
+    print("\nParity report (PyTorch vs quantized ONNX):")
+    for key, value in report.items():
+        print(f"  {key}: {value}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export BERT to INT8 ONNX and check parity with PyTorch.")
+    parser.add_argument("--model-path", default=BERT_MODEL_PATH)
+    parser.add_argument("--output", default=BERT_ONNX_PATH)
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--min-agreement", type=float, default=0.99)
+    parser.add_argument("--skip-parity", action="store_true")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    fp32_path = os.path.join(os.path.dirname(args.output) or ".", "model.onnx")
+    export_onnx(args.model_path, fp32_path)
+    quantize(fp32_path, args.output)
+
+    if args.skip_parity:
+        return
+    report = check_parity(args.model_path, args.output,
+                          load_holdout_texts(args.samples))
+    if report["label_agreement"] < args.min_agreement:
+        print(f"  [FAIL] Label agreement below {args.min_agreement}")
+        sys.exit(1)
+    print("  [OK] Quantized model is within the parity threshold")
+
+
+if __name__ == "__main__":
+    main()
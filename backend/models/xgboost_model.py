@@ -1,18 +1,61 @@
+import os
+
 import joblib
 import xgboost as xgb
 
-from utils.config import TFIDF_PATH, XGBOOST_MODEL_PATH
+from models.bundle import open_bundle
+from models.tfidf_fast import CharNgramTfidf
+from utils import metrics
+from utils.artifacts import artifact_version
+from utils.config import (FAST_TFIDF, MODEL_BUNDLE_DIR, TFIDF_PATH,
+                          XGBOOST_INPLACE_PREDICT, XGBOOST_MODEL_PATH)
+
+# Populated by load_model(); see models/loader.py
+model = None
+tfidf = None
+vectorizer = None  # tfidf itself or its precompiled CharNgramTfidf
+MODEL_VERSION = None
+
+
+def load_model(model_path=XGBOOST_MODEL_PATH, tfidf_path=TFIDF_PATH,
+               bundle_path=os.path.join(MODEL_BUNDLE_DIR, "XGBoost")):
+    global model, tfidf, vectorizer, MODEL_VERSION
+    model = xgb.Booster()
+    manifest = open_bundle(bundle_path, "XGBoost", (model_path, tfidf_path))
+    if manifest is not None:
+        # Binary booster and TF-IDF arrays instead of JSON and a pickled
+        # vectorizer; the bundle always uses the precompiled TF-IDF
+        model.load_model(os.path.join(bundle_path, "model.ubj"))
+        tfidf = None
+        vectorizer = CharNgramTfidf.load_arrays(bundle_path, manifest['settings']['tfidf'])
+        MODEL_VERSION = artifact_version(bundle_path)
+        return
+    model.load_model(model_path)
+    tfidf = joblib.load(tfidf_path)
+    vectorizer = CharNgramTfidf.from_vectorizer(tfidf) if FAST_TFIDF else tfidf
+    MODEL_VERSION = artifact_version(model_path, tfidf_path)
+
+
+def predict_probs(vectorized):
+    if XGBOOST_INPLACE_PREDICT:
+        # Reads the CSR buffers directly, no DMatrix allocation per request
+        return model.inplace_predict(vectorized)
+    return model.predict(xgb.DMatrix(vectorized))
+
 
-# Load XGBoost model and TF-IDF vectorizer
-model = xgb.Booster()
-model.load_model(XGBOOST_MODEL_PATH)
-tfidf = joblib.load(TFIDF_PATH)
+def analyze_messages(messages):
+    # A single sparse TF-IDF matrix and one predict call for the whole batch
+    with metrics.time_model("XGBoost", "tokenize"):
+        vectorized = vectorizer.transform(list(messages))
+    with metrics.time_model("XGBoost", "infer"):
+        probs = predict_probs(vectorized)
+    results = []
+    for prob in probs:
+        label = int(prob > 0.5)  # 1 for fraud, 0 for legit
+        confidence = float(prob if label == 1 else 1 - prob)
+        results.append((label, confidence))
+    return results
 
 
 def analyze_message(message):
-    vectorized = tfidf.transform([message])
-    dmatrix = xgb.DMatrix(vectorized)
-    prob = model.predict(dmatrix)[0]
-    label = int(prob > 0.5)  # 1 for fraud, 0 for legit
-    confidence = float(prob if label == 1 else 1 - prob)
-    return label, confidence
+    return analyze_messages([message])[0]
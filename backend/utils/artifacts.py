@@ -0,0 +1,47 @@
+import hashlib
+import os
+from datetime import datetime
+
+
+def _artifact_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    yield os.path.join(root, name)
+        elif os.path.exists(path):
+            yield path
+
+
+def artifact_version(*paths):
+    """Short fingerprint of model artifacts based on their paths, sizes and
+    modification times. It changes whenever an artifact is rewritten."""
+    digest = hashlib.sha1()
+    for file_path in _artifact_files(paths):
+        stat = os.stat(file_path)
+        digest.update(
+            f"{file_path}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def artifact_fingerprint(*paths):
+    """Like ``artifact_version`` but independent of where the artifacts are
+    stored, so it survives copying them with their modification times (e.g.
+    into the model registry)."""
+    digest = hashlib.sha1()
+    for path in paths:
+        for file_path in _artifact_files([path]):
+            stat = os.stat(file_path)
+            relative = os.path.relpath(file_path, path) if os.path.isdir(path) else ""
+            digest.update(
+                f"{relative}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def artifact_mtime(*paths):
+    """Newest modification time of the given artifacts as a naive UTC datetime."""
+    mtimes = [os.path.getmtime(file_path)
+              for file_path in _artifact_files(paths)]
+    if not mtimes:
+        return None
+    return datetime.utcfromtimestamp(max(mtimes))
@@ -0,0 +1,96 @@
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Collects concurrent single-message calls into one batched model call.
+
+    Callers use the batcher exactly like a model's ``analyze_message``. A
+    background thread waits up to ``max_wait_ms`` for up to ``max_batch_size``
+    messages, runs ``batch_fn`` once on all of them and hands each caller its
+    own result.
+    """
+
+    def __init__(self, name, batch_fn, max_batch_size=16, max_wait_ms=10):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self._queue = []
+        self._cond = threading.Condition()
+        self._batches = 0
+        self._items = 0
+        self._last_batch_size = 0
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name=f"{self.name}-batcher", daemon=True)
+        self._thread.start()
+
+    def __call__(self, message):
+        return self.submit(message).result()
+
+    def submit(self, message):
+        future = Future()
+        with self._cond:
+            self._queue.append((message, future))
+            self._cond.notify()
+        return future
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queue_depth': len(self._queue),
+                'batches': self._batches,
+                'messages': self._items,
+                'last_batch_size': self._last_batch_size,
+                'avg_batch_size': self._items / self._batches if self._batches else 0.0,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+            }
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._queue[:self.max_batch_size]
+            del self._queue[:self.max_batch_size]
+            self._batches += 1
+            self._items += len(batch)
+            self._last_batch_size = len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self.batch_fn([message for message, _ in batch])
+            except Exception:
+                # Score the messages one by one so a single bad input does not
+                # fail every request that happened to share its batch.
+                self._run_individually(batch)
+                continue
+            if len(results) != len(batch):
+                # zip() would leave the extra callers waiting until they time out
+                error = RuntimeError(f"{self.name} returned {len(results)} results "
+                                     f"for {len(batch)} messages")
+                for _, future in batch:
+                    future.set_exception(error)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def _run_individually(self, batch):
+        for message, future in batch:
+            try:
+                future.set_result(self.batch_fn([message])[0])
+            except Exception as e:
+                future.set_exception(e)
@@ -0,0 +1,62 @@
+import threading
+
+
+def length_buckets(lengths, max_batch_size=32, max_length_ratio=2.0):
+    """Group item indices into buckets of similar length.
+
+    Items are sorted by length and a new bucket starts when the current one
+    is full or when the next item is more than ``max_length_ratio`` times
+    longer than the bucket's shortest item. Padding each bucket only to its
+    own longest item keeps short messages from being padded to the length
+    of a long one. Callers restore the original order with the indices.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    buckets = []
+    bucket = []
+    for i in order:
+        if bucket and (len(bucket) >= max_batch_size
+                       or lengths[i] > max(1, lengths[bucket[0]]) * max_length_ratio):
+            buckets.append(bucket)
+            bucket = []
+        bucket.append(i)
+    if bucket:
+        buckets.append(bucket)
+    return buckets
+
+
+class PaddingStats:
+    """Counts real and padded token positions to report the padding ratio."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.real_tokens = 0
+        self.padded_tokens = 0
+
+    def record(self, lengths):
+        with self._lock:
+            self.batches += 1
+            self.real_tokens += sum(lengths)
+            self.padded_tokens += max(lengths) * len(lengths)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'real_tokens': self.real_tokens,
+                'padded_tokens': self.padded_tokens,
+                'padding_ratio': (1 - self.real_tokens / self.padded_tokens
+                                  if self.padded_tokens else 0.0),
+            }
+
+
+_padding_stats = {}
+
+
+def padding_stats(name):
+    """Shared PaddingStats for one model, created on first use."""
+    return _padding_stats.setdefault(name, PaddingStats())
+
+
+def all_padding_stats():
+    return {name: stats.stats() for name, stats in _padding_stats.items()}
@@ -0,0 +1,65 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_key(message, model_versions):
+    """Cache key for a message scored by a specific set of model versions."""
+    digest = hashlib.sha256()
+    digest.update(model_versions.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(message.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+class InferenceCache:
+    """Thread-safe LRU cache with a per-entry time to live."""
+
+    def __init__(self, max_entries=10000, ttl_s=3600):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, ttl_s=None):
+        ttl_s = self.ttl_s if ttl_s is None else ttl_s
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl_s)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_s': self.ttl_s,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+            }
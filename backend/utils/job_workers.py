@@ -0,0 +1,101 @@
+import threading
+import time
+from itertools import groupby
+
+from database.jobs import (claim_jobs, complete_job, fail_job,
+                           requeue_stale_jobs)
+
+
+class JobWorkerPool:
+    """Background threads that drain the SQLite job queue.
+
+    Each worker claims up to ``batch_size`` jobs at a time and hands the
+    messages of each analysis mode to ``process_batch(messages, mode)``, which
+    returns one ``(message_id, result)`` pair per message.
+    """
+
+    def __init__(self, process_batch, workers=2, batch_size=16,
+                 poll_interval_s=1.0, max_attempts=3, lease_s=600):
+        self.process_batch = process_batch
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval_s = poll_interval_s
+        self.max_attempts = max_attempts
+        self.lease_s = lease_s
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._threads = []
+        self._next_requeue = 0.0
+
+    def start(self):
+        self._requeue_stale()
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def notify(self):
+        """Wake idle workers after new jobs were enqueued."""
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _requeue_stale(self):
+        # Also runs periodically, for jobs a worker could not finish or fail
+        self._next_requeue = time.monotonic() + self.lease_s
+        try:
+            requeued = requeue_stale_jobs(self.lease_s, self.max_attempts)
+        except Exception as e:
+            print(f"Failed to requeue stale jobs: {e}")
+            return
+        if requeued:
+            print(f"Requeued or failed {requeued} stale jobs")
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if time.monotonic() >= self._next_requeue:
+                self._requeue_stale()
+            try:
+                jobs = claim_jobs(self.batch_size)
+            except Exception as e:
+                print(f"Failed to claim jobs: {e}")
+                jobs = []
+            if not jobs:
+                self._wakeup.wait(self.poll_interval_s)
+                self._wakeup.clear()
+                continue
+            jobs.sort(key=lambda job: job.mode or "")
+            for mode, group in groupby(jobs, key=lambda job: job.mode):
+                group = list(group)
+                try:
+                    self._process(group, mode)
+                except Exception as e:
+                    # E.g. the jobs database is locked. Keep the worker alive;
+                    # jobs left running are requeued once their lease expires.
+                    print(f"Processing {len(group)} jobs failed: {e}")
+
+    def _process(self, jobs, mode):
+        try:
+            outcomes = self.process_batch([job.content for job in jobs], mode)
+        except Exception as e:
+            if len(jobs) > 1:
+                # Retry one by one so a single bad message only fails its job
+                for job in jobs:
+                    self._process([job], mode)
+                return
+            error = f"{type(e).__name__}: {e}"
+            print(f"Job {jobs[0].id} failed: {error}")
+            fail_job(jobs[0].id, error, self.max_attempts)
+            return
+        for job, (message_id, result) in zip(jobs, outcomes):
+            try:
+                complete_job(job.id, message_id, result)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"Job {job.id} could not be completed: {error}")
+                fail_job(job.id, error, self.max_attempts)
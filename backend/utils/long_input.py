@@ -0,0 +1,95 @@
+from utils.config import (LONG_INPUT_AGGREGATE, LONG_INPUT_CHUNK_CHARS,
+                          LONG_INPUT_MAX_CHARS, LONG_INPUT_MAX_CHUNKS,
+                          LONG_INPUT_POLICY)
+from utils.tiering import fraud_probability
+
+LONG_INPUT_POLICIES = ('none', 'truncate', 'chunk')
+if LONG_INPUT_POLICY not in LONG_INPUT_POLICIES:
+    raise ValueError(f"LONG_INPUT_POLICY must be one of {', '.join(LONG_INPUT_POLICIES)}")
+if LONG_INPUT_AGGREGATE not in ('max', 'mean'):
+    raise ValueError("LONG_INPUT_AGGREGATE must be max or mean")
+
+# Results of long messages depend on the policy, so it is part of the
+# result cache key
+POLICY_KEY = {
+    'none': "none",
+    'truncate': f"truncate-{LONG_INPUT_MAX_CHARS}",
+    'chunk': (f"chunk-{LONG_INPUT_MAX_CHARS}-{LONG_INPUT_CHUNK_CHARS}"
+              f"x{LONG_INPUT_MAX_CHUNKS}-{LONG_INPUT_AGGREGATE}"),
+}[LONG_INPUT_POLICY]
+
+
+def is_long(message):
+    return LONG_INPUT_POLICY != 'none' and len(message) > LONG_INPUT_MAX_CHARS
+
+
+def clip(text, max_chars):
+    """The first ``max_chars`` characters, ending at a space if one is near."""
+    if len(text) <= max_chars:
+        return text
+    text = text[:max_chars]
+    space = text.rfind(" ")
+    return text[:space] if space > max_chars // 2 else text
+
+
+def chunks(message, chunk_chars=LONG_INPUT_CHUNK_CHARS, max_chunks=LONG_INPUT_MAX_CHUNKS):
+    """Up to ``max_chunks`` windows of ``chunk_chars`` characters spread
+    evenly from the start to the end of the message, so a scam hidden at
+    the end of a long text is still seen."""
+    count = min(max_chunks, -(-len(message) // chunk_chars))
+    if count <= 1:
+        return [clip(message, chunk_chars)]
+    step = (len(message) - chunk_chars) / (count - 1)
+    return [clip(message[round(i * step):], chunk_chars) for i in range(count)]
+
+
+def model_inputs(message):
+    """What the models score for ``message``: the message itself, or its
+    truncation or chunks under the long-input policy."""
+    if not is_long(message):
+        return [message]
+    if LONG_INPUT_POLICY == 'truncate':
+        return [clip(message, LONG_INPUT_MAX_CHARS)]
+    return chunks(message)
+
+
+def aggregate(results):
+    """Combine the (label, confidence) results of one message's chunks."""
+    if len(results) == 1:
+        return results[0]
+    probs = [fraud_probability(result) for result in results]
+    prob = max(probs) if LONG_INPUT_AGGREGATE == 'max' else sum(probs) / len(probs)
+    label = int(prob > 0.5)
+    return (label, float(prob if label == 1 else 1 - prob))
+
+
+def analyze_long_messages(analyze_messages, messages):
+    """Run a model's batched ``analyze_messages`` under the long-input
+    policy: short messages pass through unchanged, and all inputs of the
+    batch, chunks included, go to the model in a single call."""
+    if not any(is_long(message) for message in messages):
+        return analyze_messages(messages)
+    inputs = []
+    spans = []
+    for message in messages:
+        message_inputs = model_inputs(message)
+        spans.append((len(inputs), len(inputs) + len(message_inputs)))
+        inputs.extend(message_inputs)
+    results = analyze_messages(inputs)
+    return [aggregate(results[start:end]) for start, end in spans]
+
+
+def report(message):
+    """How a message was shortened, for the response; None if it was not."""
+    if not is_long(message):
+        return None
+    inputs = model_inputs(message)
+    summary = {
+        'policy': LONG_INPUT_POLICY,
+        'original_chars': len(message),
+        'analyzed_chars': sum(len(text) for text in inputs),
+    }
+    if LONG_INPUT_POLICY == 'chunk':
+        summary['chunks'] = len(inputs)
+        summary['aggregate'] = LONG_INPUT_AGGREGATE
+    return summary
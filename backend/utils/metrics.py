@@ -0,0 +1,164 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+from utils.config import METRICS_ENABLED
+
+# Every helper is a no-op unless METRICS_ENABLED is set or the request asked
+# for a timing breakdown, so prometheus_client stays an optional dependency
+# and the hot path pays nothing by default.
+ENABLED = METRICS_ENABLED
+_NOOP = nullcontext()
+
+if ENABLED:
+    from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry,
+                                   Counter, Gauge, Histogram, generate_latest)
+    from prometheus_client import multiprocess
+
+    # Model calls and stages range from sub-millisecond (XGBoost) to seconds
+    # (BERT on large batches)
+    LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                       0.5, 1.0, 2.5, 5.0, 10.0)
+
+    REQUESTS = Counter(
+        'scamalyzer_requests_total', 'HTTP requests by endpoint and status',
+        ['endpoint', 'method', 'status'])
+    REQUEST_LATENCY = Histogram(
+        'scamalyzer_request_duration_seconds', 'HTTP request latency',
+        ['endpoint', 'method'], buckets=LATENCY_BUCKETS)
+    IN_FLIGHT = Gauge(
+        'scamalyzer_requests_in_flight', 'Requests being served',
+        multiprocess_mode='livesum')
+    STAGE_LATENCY = Histogram(
+        'scamalyzer_stage_duration_seconds',
+        'Latency of a request stage (analyze, persist)',
+        ['stage'], buckets=LATENCY_BUCKETS)
+    MODEL_LATENCY = Histogram(
+        'scamalyzer_model_duration_seconds',
+        'Latency of a model call by stage (tokenize, infer, total)',
+        ['model', 'stage'], buckets=LATENCY_BUCKETS)
+    DB_LATENCY = Histogram(
+        'scamalyzer_db_duration_seconds', 'Database time by operation',
+        ['operation'], buckets=LATENCY_BUCKETS)
+    MODEL_LOAD = Gauge(
+        'scamalyzer_model_load_seconds',
+        'Model import, load and warmup time', ['model', 'phase'],
+        multiprocess_mode='max')
+
+
+class RequestTiming:
+    """Stage durations of one request, collected for the X-Debug: timing
+    breakdown. Spans with the same name (e.g. BERT inference per length
+    bucket) are added up."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = {}
+        self._lock = threading.Lock()  # parallel models record concurrently
+
+    def add(self, name, seconds):
+        with self._lock:
+            total, calls = self.spans.get(name, (0.0, 0))
+            self.spans[name] = (total + seconds, calls + 1)
+
+    def summary(self):
+        with self._lock:
+            spans = {name: {'ms': round(total * 1000, 3), 'calls': calls}
+                     for name, (total, calls) in self.spans.items()}
+        return {'total_ms': round((time.perf_counter() - self.start) * 1000, 3),
+                'spans': spans}
+
+    def server_timing(self):
+        # Server-Timing header, readable in browser dev tools
+        with self._lock:
+            return ", ".join(f'{name.replace(".", "-")};dur={total * 1000:.3f}'
+                             for name, (total, _) in self.spans.items())
+
+
+_request_timing = contextvars.ContextVar('request_timing', default=None)
+
+
+def start_request_timing():
+    timing = RequestTiming()
+    return timing, _request_timing.set(timing)
+
+
+def stop_request_timing(token):
+    _request_timing.reset(token)
+
+
+def current_request_timing():
+    return _request_timing.get()
+
+
+class _Timer:
+    __slots__ = ('histogram', 'timing', 'span', 'start')
+
+    def __init__(self, histogram, timing, span):
+        self.histogram = histogram
+        self.timing = timing
+        self.span = span
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.histogram is not None:
+            self.histogram.observe(elapsed)
+        if self.timing is not None:
+            self.timing.add(self.span, elapsed)
+        return False
+
+
+def time_stage(stage):
+    timing = _request_timing.get()
+    if not ENABLED and timing is None:
+        return _NOOP
+    return _Timer(STAGE_LATENCY.labels(stage) if ENABLED else None, timing, stage)
+
+
+def time_model(model, stage):
+    timing = _request_timing.get()
+    if not ENABLED and timing is None:
+        return _NOOP
+    return _Timer(MODEL_LATENCY.labels(model, stage) if ENABLED else None,
+                  timing, f"{model}.{stage}")
+
+
+def time_db(operation):
+    timing = _request_timing.get()
+    if not ENABLED and timing is None:
+        return _NOOP
+    return _Timer(DB_LATENCY.labels(operation) if ENABLED else None,
+                  timing, f"db.{operation}")
+
+
+def record_model_load(model, phase, seconds):
+    if ENABLED and seconds is not None:
+        MODEL_LOAD.labels(model, phase).set(seconds)
+
+
+def request_started():
+    if ENABLED:
+        IN_FLIGHT.inc()
+
+
+def request_finished(endpoint, method, status, seconds):
+    if ENABLED:
+        IN_FLIGHT.dec()
+        REQUESTS.labels(endpoint, method, status).inc()
+        REQUEST_LATENCY.labels(endpoint, method).observe(seconds)
+
+
+def render():
+    """Return the exposition body and content type for GET /metrics."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # Aggregate the metric files written by every worker process
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
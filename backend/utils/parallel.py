@@ -0,0 +1,74 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class ExecutorBusy(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """Thread pool that rejects work instead of queueing it without limit."""
+
+    def __init__(self, name, max_workers, max_pending):
+        self.name = name
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorBusy(f"{self.name} executor is saturated")
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # A timed-out call keeps its slot until it really finishes, so a
+        # stuck model cannot pile up unbounded background work.
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+class ParallelModelRunner:
+    """Runs every model on its own executor and waits for all of them.
+
+    ``models`` maps a model name to ``(analyze_fn, max_workers, timeout_s)``.
+    A model that fails, times out or is saturated yields ``None`` instead of
+    failing the whole call; the reason is returned in ``errors``.
+    """
+
+    def __init__(self, models, max_pending=16):
+        self.models = {
+            name: (fn, BoundedExecutor(name, workers, max_pending), timeout)
+            for name, (fn, workers, timeout) in models.items()
+        }
+
+    def run(self, message):
+        start = time.monotonic()
+        futures = {}
+        errors = {}
+        for name, (fn, executor, _) in self.models.items():
+            try:
+                # Run in a copy of the caller's context so per-request
+                # timing (utils/metrics.py) sees the model stages
+                futures[name] = executor.submit(
+                    contextvars.copy_context().run, fn, message)
+            except ExecutorBusy as e:
+                errors[name] = str(e)
+
+        results = {}
+        for name, (_, _, timeout) in self.models.items():
+            results[name] = None
+            if name not in futures:
+                continue
+            remaining = max(0.0, start + timeout - time.monotonic())
+            try:
+                results[name] = futures[name].result(timeout=remaining)
+            except FutureTimeoutError:
+                errors[name] = f"timed out after {timeout}s"
+            except Exception as e:
+                errors[name] = f"{type(e).__name__}: {e}"
+        return results, errors
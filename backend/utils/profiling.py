@@ -0,0 +1,21 @@
+from utils.config import PROFILER_INTERVAL_S
+
+
+class RequestProfiler:
+    """Sampling profile of one request (X-Debug: profile), rendered as a
+    self-contained HTML report. Needs the optional pyinstrument package,
+    imported only when a profile is requested."""
+
+    def __init__(self, interval_s=PROFILER_INTERVAL_S):
+        from pyinstrument import Profiler
+
+        self._profiler = Profiler(interval=interval_s)
+
+    def start(self):
+        self._profiler.start()
+
+    def stop(self):
+        self._profiler.stop()
+
+    def html(self):
+        return self._profiler.output_html()
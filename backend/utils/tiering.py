@@ -0,0 +1,13 @@
+def fraud_probability(result):
+    """Probability of the fraud class from a (label, confidence) result."""
+    label, confidence = result
+    return confidence if int(label) == 1 else 1 - confidence
+
+
+def is_uncertain(results, low, high):
+    """True when the cheap tiers disagree or any of them falls inside the
+    [low, high] band of fraud probability, i.e. BERT should be consulted."""
+    fraud_probs = [fraud_probability(result) for result in results]
+    if len({prob > 0.5 for prob in fraud_probs}) > 1:
+        return True
+    return any(low <= prob <= high for prob in fraud_probs)
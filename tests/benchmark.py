@@ -0,0 +1,241 @@
+# benchmark.py
+# Microbenchmarks for the inference and data pipeline hot paths:
+#   - each model's analyze_message at several input lengths, on tiny
+#     stand-in models (standin_models.py) loaded through the real modules
+#   - api.routes.format_message over 100k rows
+#   - dataset_cleaner.clean_text / normalize_label over a 1M-row frame
+#   - retraining.prepare_xgboost_data
+# Benchmarks whose dependencies are not installed are skipped.
+#
+# Record a baseline, then gate later runs on it (exit code 1 when a
+# benchmark's median is more than --threshold slower than the baseline):
+#   python tests/benchmark.py --save-baseline tests/benchmark_baseline.json
+#   python tests/benchmark.py --baseline tests/benchmark_baseline.json --threshold 0.25
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(TESTS_DIR, '..', 'backend'))
+MESSAGE_LENGTHS = (8, 64, 256)  # words
+
+BENCHMARKS = []
+
+
+def benchmark(name, repeat=5, number=1):
+    """Register ``setup(scale) -> fn``; ``fn`` is timed ``number`` times per
+    repeat, so reported times are per call."""
+    def register(setup):
+        BENCHMARKS.append((name, setup, repeat, number))
+        return setup
+    return register
+
+
+def prepare_environment(workdir):
+    # A throwaway database, even if the shell exports a real one, and no
+    # background services for imported modules
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'messages.db')}"
+    os.environ['JOBS_DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'jobs.db')}"
+    os.environ['MODEL_LOADING'] = 'lazy'
+    os.environ['JOB_WORKERS'] = '0'
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, TESTS_DIR)
+
+
+def model_benchmarks(workdir):
+    from standin_models import BUILDERS, message_of_length, synthetic_messages
+
+    messages, labels = synthetic_messages(2000)
+    for model_name, build in BUILDERS.items():
+        state = {}
+
+        def load(build=build, model_name=model_name, state=state):
+            # Built once and shared by the benchmarks of every length
+            if 'module' not in state:
+                model_dir = os.path.join(workdir, model_name)
+                os.makedirs(model_dir, exist_ok=True)
+                state['module'] = build(model_dir, messages, labels)
+                state['module'].analyze_message("warmup")
+            return state['module']
+
+        for words in MESSAGE_LENGTHS:
+            def setup(scale, load=load, words=words):
+                module = load()
+                message = message_of_length(words)
+                return lambda: module.analyze_message(message)
+            benchmark(f"{model_name}.analyze_message.{words}w", repeat=5, number=20)(setup)
+
+
+@benchmark("routes.format_message.100k", repeat=5)
+def format_message_setup(scale):
+    from api.routes import format_message
+    from database.database import Message
+
+    rows = [
+        Message(id=i, content=f"Message number {i} with some content", content_hash=None,
+                bert_label="1", bert_confidence=0.9, bilstm_label="0", bilstm_confidence=0.7,
+                xgboost_label="1", xgboost_confidence=0.8, timestamp=datetime(2024, 1, 1),
+                verified=False, used_for_training=False, label=None)
+        for i in range(int(100000 * scale))
+    ]
+    return lambda: [format_message(row) for row in rows]
+
+
+def cleaner_frame(scale):
+    import numpy as np
+    import pandas as pd
+
+    from standin_models import synthetic_messages
+
+    rows = int(1000000 * scale)
+    messages, _ = synthetic_messages(1000)
+    rng = np.random.default_rng(42)
+    raw_labels = np.array(['spam', 'ham', '1', '0', 1.0, 0.0, 'Phishing', 'not spam', None, 'x'],
+                          dtype=object)
+    return pd.DataFrame({
+        'message': np.array([f'  "{m}"\t{i % 97}' for i, m in enumerate(messages)],
+                            dtype=object)[rng.integers(0, len(messages), rows)],
+        'label': raw_labels[rng.integers(0, len(raw_labels), rows)],
+    })
+
+
+@benchmark("dataset_cleaner.clean_text.1M", repeat=3)
+def clean_text_setup(scale):
+    from utils.dataset_cleaner import clean_text
+
+    frame = cleaner_frame(scale)
+    return lambda: frame['message'].map(clean_text)
+
+
+@benchmark("dataset_cleaner.normalize_label.1M", repeat=3)
+def normalize_label_setup(scale):
+    from utils.dataset_cleaner import normalize_label
+
+    frame = cleaner_frame(scale)
+    return lambda: frame['label'].map(normalize_label)
+
+
+def prepare_xgboost_setup(single_class):
+    def setup(scale):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        from models.retraining.retraining import prepare_xgboost_data
+        from standin_models import synthetic_messages
+
+        messages, labels = synthetic_messages(int(5000 * scale) or 1)
+        tfidf = TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), max_features=50000)
+        tfidf.fit(messages)
+        if single_class:
+            # Exercises the synthetic-row path taken when all verified
+            # messages share one label
+            labels = [1] * len(labels)
+        return lambda: prepare_xgboost_data(messages, labels, tfidf)
+    return setup
+
+
+benchmark("retraining.prepare_xgboost_data.mixed", repeat=3)(prepare_xgboost_setup(False))
+benchmark("retraining.prepare_xgboost_data.single_class", repeat=3)(prepare_xgboost_setup(True))
+
+
+def run_benchmark(setup, repeat, number, scale):
+    fn = setup(scale)
+    fn()  # warm caches and lazy initialization outside the timing
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return {
+        'median_s': statistics.median(times),
+        'min_s': min(times),
+        'max_s': max(times),
+        'repeat': repeat,
+        'number': number,
+    }
+
+
+def check_regressions(results, baseline, threshold):
+    regressions = []
+    print(f"\n{'benchmark':<50} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, result in results.items():
+        if name not in baseline.get('benchmarks', {}):
+            continue
+        before = baseline['benchmarks'][name]['median_s']
+        after = result['median_s']
+        change = (after - before) / before if before else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{name:<50} {before * 1000:>10.3f}ms {after * 1000:>10.3f}ms {change:>+8.1%}{flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Scamalyzer microbenchmarks.")
+    parser.add_argument("--only", help="Regex selecting the benchmarks to run")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Scale the row counts of the data benchmarks (e.g. 0.1 for a quick run)")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--save-baseline", help="Write the results as a new baseline")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown of the median before failing (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='scamalyzer-bench-')
+    prepare_environment(workdir)
+    model_benchmarks(workdir)
+
+    results = {}
+    skipped = {}
+    for name, setup, repeat, number in BENCHMARKS:
+        if args.only and not re.search(args.only, name):
+            continue
+        try:
+            results[name] = run_benchmark(setup, repeat, number, args.scale)
+        except ImportError as e:
+            skipped[name] = f"missing dependency: {e.name or e}"
+            print(f"  [SKIP] {name}: {skipped[name]}")
+            continue
+        print(f"  [OK] {name}: median {results[name]['median_s'] * 1000:.3f} ms")
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'scale': args.scale,
+        'benchmarks': results,
+        'skipped': skipped,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"Results saved to {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('scale') != args.scale:
+            print(f"  [WARN] Baseline was recorded with --scale {baseline.get('scale')}")
+        regressions = check_regressions(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n[FAIL] {len(regressions)} benchmark(s) regressed by more than "
+                  f"{args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\n[OK] No benchmark regressed by more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
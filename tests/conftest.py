@@ -0,0 +1,17 @@
+# conftest.py
+# Makes the backend importable and points its databases at a temporary
+# directory before any backend module creates its engine.
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BACKEND_DIR)
+
+_database_dir = tempfile.mkdtemp(prefix="scamalyzer-tests-")
+atexit.register(shutil.rmtree, _database_dir, ignore_errors=True)
+# Never the databases the shell may export
+os.environ["DATABASE_URL"] = f"sqlite:///{_database_dir}/messages.db"
+os.environ["JOBS_DATABASE_URL"] = f"sqlite:///{_database_dir}/jobs.db"
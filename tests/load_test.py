@@ -0,0 +1,299 @@
+# load_test.py
+# Replays a message corpus against /analyze or /analyze/batch at a fixed
+# concurrency (closed loop) or arrival rate (open loop) and reports
+# throughput and latency percentiles. Results can be saved as JSON and
+# compared with an earlier run.
+#
+# Against a running server (start it with RATELIMIT_ENABLED=false, or the
+# rate limits cap the throughput):
+#   python tests/load_test.py --url http://localhost:5000 --concurrency 8 --requests 500
+# In-process with stub models, to measure the HTTP and database layers only:
+#   python tests/load_test.py --in-process --stub-latency-ms 5 --rate 50 --duration 30
+# Repeated messages are served from the result cache; set RESULT_CACHE_SIZE=0
+# to make every request run the models.
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+ENDPOINTS = {'analyze': '/analyze', 'batch': '/analyze/batch'}
+
+
+# Used when no --corpus is given
+SAMPLE_MESSAGES = [
+    "Your account has been locked. Verify your details at http://example.com now.",
+    "Congratulations! You've won $1,000,000! Click here to claim your prize.",
+    "Hi, are we still on for lunch tomorrow?",
+    "Your package could not be delivered. Pay the customs fee to reschedule.",
+    "Reminder: your dentist appointment is on Monday at 10am.",
+    "URGENT: your bank card has been suspended, reply with your PIN to unlock it.",
+    "Can you send me the slides from today's meeting?",
+    "You have been selected for a free iPhone. Confirm your address to receive it.",
+    "Happy birthday! Hope you have a great day 🎉",
+    "Your verification code is 482913. Do not share it with anyone.",
+]
+
+
+def load_corpus(path):
+    """Messages from a .txt (one per line), .csv (message column) or .json
+    (list of strings) file."""
+    if path is None:
+        return SAMPLE_MESSAGES
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            return [row['message'] for row in csv.DictReader(f) if row.get('message')]
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            return [message for message in json.load(f) if message]
+    with open(path, encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+
+def make_stub_model(name, latency_s):
+    """Model module stand-in: sleeps for the given latency per call and
+    returns a label derived from the message hash."""
+    module = types.ModuleType(f'stub_{name}')
+    module.MODEL_VERSION = 'stub'
+
+    def analyze_messages(messages):
+        time.sleep(latency_s)
+        results = []
+        for message in messages:
+            digest = hashlib.sha256(message.encode('utf-8', 'surrogatepass')).digest()
+            results.append((digest[0] % 2, 0.5 + digest[1] / 512))
+        return results
+
+    module.analyze_messages = analyze_messages
+    module.analyze_message = lambda message: analyze_messages([message])[0]
+    return module
+
+
+def in_process_client_factory(stub_latency_s):
+    """Import the app with a throwaway database and, unless stub latency is
+    negative, stub models registered with the loader."""
+    workdir = tempfile.mkdtemp(prefix='scamalyzer-load-')
+    # Always the throwaway databases, even if the shell exports real ones
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'messages.db')}"
+    os.environ['JOBS_DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'jobs.db')}"
+    os.environ['RATELIMIT_ENABLED'] = 'false'
+    os.environ['JOB_WORKERS'] = '0'
+    # The registry watcher would replace the stub models with real ones
+    os.environ['MODEL_REGISTRY_POLL_S'] = '0'
+    if stub_latency_s >= 0:
+        os.environ['MODEL_LOADING'] = 'lazy'
+    sys.path.insert(0, BACKEND_DIR)
+
+    from models import loader
+    if stub_latency_s >= 0:
+        for name in loader.MODEL_MODULES:
+            loader._modules[name] = make_stub_model(name, stub_latency_s)
+            loader._status[name]['state'] = 'ready'
+    from app import app
+
+    local = threading.local()
+
+    def post(path, payload):
+        # Test clients are not shared between threads
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        response = local.client.post(path, json=payload)
+        return response.status_code
+    return post
+
+
+def http_client_factory(base_url, api_key=None):
+    import requests
+
+    local = threading.local()
+    headers = {'X-API-KEY': api_key} if api_key else {}
+
+    def post(path, payload):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        response = local.session.post(base_url.rstrip('/') + path, json=payload,
+                                      headers=headers, timeout=120)
+        return response.status_code
+    return post
+
+
+def make_payloads(corpus, endpoint, batch_size, count, seed):
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(count):
+        if endpoint == 'batch':
+            payloads.append({'messages': [rng.choice(corpus) for _ in range(batch_size)]})
+        else:
+            payloads.append({'message': rng.choice(corpus)})
+    return payloads
+
+
+def timed_post(post, path, payload):
+    start = time.perf_counter()
+    try:
+        status = post(path, payload)
+    except Exception as e:
+        status = type(e).__name__
+    return status, time.perf_counter() - start
+
+
+def run_closed_loop(post, path, payloads, concurrency):
+    # Each worker sends its next request as soon as the previous one returns
+    results = [None] * len(payloads)
+    next_index = iter(range(len(payloads)))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(next_index, None)
+            if i is None:
+                return
+            results[i] = timed_post(post, path, payloads[i])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(worker)
+    return results
+
+
+def run_open_loop(post, path, payloads, rate, max_in_flight, seed):
+    # Poisson arrivals at the given rate, independent of response times, so
+    # queueing delay shows up in the latencies instead of lowering the load
+    rng = random.Random(seed)
+    futures = []
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        next_arrival = time.perf_counter()
+        for payload in payloads:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(timed_post, post, path, payload))
+            next_arrival += rng.expovariate(rate)
+    return [future.result() for future in futures]
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(results, elapsed_s, messages_per_request):
+    latencies = sorted(latency for status, latency in results if status == 200)
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ms = lambda value: round(value * 1000, 3) if value is not None else None  # noqa: E731
+    return {
+        'requests': len(results),
+        'ok': len(latencies),
+        'statuses': statuses,
+        'elapsed_s': round(elapsed_s, 3),
+        'throughput_rps': round(len(latencies) / elapsed_s, 3) if elapsed_s else 0.0,
+        'messages_per_s': round(len(latencies) * messages_per_request / elapsed_s, 3) if elapsed_s else 0.0,
+        'latency_ms': {
+            'mean': ms(sum(latencies) / len(latencies)) if latencies else None,
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(latencies[-1]) if latencies else None,
+        },
+    }
+
+
+def compare(summary, baseline):
+    print("\nChange against baseline:")
+    for key in ('throughput_rps', 'messages_per_s'):
+        print(f"  {key}: {baseline[key]} -> {summary[key]}")
+    for key in ('p50', 'p95', 'p99'):
+        before, after = baseline['latency_ms'][key], summary['latency_ms'][key]
+        change = f" ({(after - before) / before:+.1%})" if before and after is not None else ""
+        print(f"  latency {key}: {before} ms -> {after} ms{change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Scamalyzer API.")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://localhost:5000")
+    target.add_argument("--in-process", action="store_true",
+                        help="Serve the app in this process with a temporary database")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0,
+                        help="Per-call latency of the stub models (in-process only); "
+                             "negative loads the real models")
+    parser.add_argument("--api-key", default=os.getenv("ADMIN_API_KEY"))
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="analyze")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--corpus", help=".txt, .csv or .json file of messages")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, default=4,
+                      help="Closed loop: number of requests kept in flight")
+    load.add_argument("--rate", type=float, help="Open loop: arrivals per second")
+    parser.add_argument("--max-in-flight", type=int, default=64,
+                        help="Client threads available to the open loop")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--duration", type=float,
+                        help="Open loop: run for this many seconds instead of --requests")
+    parser.add_argument("--warmup", type=int, default=10,
+                        help="Requests sent before measuring")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if args.in_process:
+        post = in_process_client_factory(args.stub_latency_ms / 1000)
+    else:
+        post = http_client_factory(args.url, args.api_key)
+    path = ENDPOINTS[args.endpoint]
+    messages_per_request = args.batch_size if args.endpoint == 'batch' else 1
+
+    count = args.requests
+    if args.rate and args.duration:
+        count = int(args.rate * args.duration)
+    payloads = make_payloads(corpus, args.endpoint, args.batch_size, count, args.seed)
+
+    for payload in make_payloads(corpus, args.endpoint, args.batch_size, args.warmup, args.seed + 1):
+        timed_post(post, path, payload)
+
+    print(f"Sending {count} requests to {path} "
+          + (f"at {args.rate}/s" if args.rate else f"with concurrency {args.concurrency}"))
+    start = time.perf_counter()
+    if args.rate:
+        results = run_open_loop(post, path, payloads, args.rate, args.max_in_flight, args.seed)
+    else:
+        results = run_closed_loop(post, path, payloads, args.concurrency)
+    summary = summarize(results, time.perf_counter() - start, messages_per_request)
+    summary['config'] = {
+        'target': 'in-process' if args.in_process else args.url,
+        'stub_latency_ms': args.stub_latency_ms if args.in_process else None,
+        'endpoint': path,
+        'batch_size': messages_per_request,
+        'concurrency': None if args.rate else args.concurrency,
+        'rate': args.rate,
+        'corpus': args.corpus,
+        'corpus_size': len(corpus),
+    }
+    print(json.dumps(summary, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(summary, json.load(f))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
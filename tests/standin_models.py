@@ -0,0 +1,120 @@
+# standin_models.py
+# Tiny stand-ins for the three production models, built on the fly from a
+# synthetic corpus and loaded through each model module's own load_model(),
+# so benchmarks exercise the real serving code without the real weights.
+# The architectures match the training scripts at a fraction of the size,
+# so absolute timings are lower than in production; use them to compare
+# runs with each other, not as production latencies.
+import os
+import random
+
+SCAM_PHRASES = [
+    "your account has been suspended", "verify your details now",
+    "you have won a prize", "click the link to claim", "send your pin",
+    "urgent action required", "pay the customs fee", "confirm your password",
+]
+LEGIT_PHRASES = [
+    "see you at lunch tomorrow", "the meeting moved to three",
+    "thanks for the slides", "happy birthday", "your order has shipped",
+    "call me when you are free", "dinner is at seven", "the report is attached",
+]
+
+
+def synthetic_messages(count, seed=42):
+    """Return (messages, labels) built from scam and legit phrases."""
+    rng = random.Random(seed)
+    messages, labels = [], []
+    for _ in range(count):
+        label = rng.randint(0, 1)
+        phrases = SCAM_PHRASES if label else LEGIT_PHRASES
+        words = " ".join(rng.choice(phrases) for _ in range(rng.randint(1, 4)))
+        messages.append(words.capitalize() + rng.choice([".", "!", "?", ""]))
+        labels.append(label)
+    return messages, labels
+
+
+def message_of_length(words, seed=0):
+    rng = random.Random(seed)
+    vocabulary = " ".join(SCAM_PHRASES + LEGIT_PHRASES).split()
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def build_xgboost(workdir, messages, labels):
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from xgboost import XGBClassifier
+
+    from models import xgboost_model
+
+    # Same vectorizer settings as train_xboost.py, smaller vocabulary
+    tfidf = TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), max_features=5000)
+    X = tfidf.fit_transform(messages)
+    clf = XGBClassifier(objective="binary:logistic", n_estimators=25, max_depth=4)
+    clf.fit(X, labels)
+    model_path = os.path.join(workdir, "xgb_model.json")
+    tfidf_path = os.path.join(workdir, "tfidf.pkl")
+    clf.save_model(model_path)
+    joblib.dump(tfidf, tfidf_path)
+    xgboost_model.load_model(model_path, tfidf_path)
+    return xgboost_model
+
+
+def build_bilstm(workdir, messages, labels):
+    import numpy as np
+    from tensorflow.keras.layers import LSTM, Bidirectional, Dense, Embedding
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.preprocessing.text import Tokenizer
+
+    from models import bilstm_model
+
+    tokenizer = Tokenizer(num_words=1000, oov_token="<UNK>")
+    tokenizer.fit_on_texts(messages)
+    model = Sequential([
+        Embedding(input_dim=1000, output_dim=16),
+        Bidirectional(LSTM(8)),
+        Dense(1, activation="sigmoid"),
+    ])
+    model.compile(optimizer="adam", loss="binary_crossentropy")
+    model.build((None, bilstm_model.MAX_LEN))
+    # Untrained weights are enough for timing
+    model.predict(np.zeros((1, bilstm_model.MAX_LEN), dtype=np.int32), verbose=0)
+    model_path = os.path.join(workdir, "bilstm_model.keras")
+    tokenizer_path = os.path.join(workdir, "bilstm_tokenizer.json")
+    model.save(model_path)
+    with open(tokenizer_path, "w") as f:
+        f.write(tokenizer.to_json())
+    bilstm_model.load_model(model_path, tokenizer_path,
+                            tflite_path=os.path.join(workdir, "bilstm_model.tflite"))
+    return bilstm_model
+
+
+def build_bert(workdir, messages, labels):
+    from transformers import (BertTokenizerFast, DistilBertConfig,
+                              DistilBertForSequenceClassification)
+
+    from models import bert_model
+
+    words = sorted({word.strip(".!?").lower() for message in messages
+                    for word in message.split()})
+    special = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    vocab = list(dict.fromkeys(special + list("abcdefghijklmnopqrstuvwxyz.!?") + words))
+    model_dir = os.path.join(workdir, "bert")
+    os.makedirs(model_dir, exist_ok=True)
+    vocab_path = os.path.join(model_dir, "vocab.txt")
+    with open(vocab_path, "w") as f:
+        f.write("\n".join(vocab))
+    tokenizer = BertTokenizerFast(vocab_file=vocab_path, do_lower_case=True)
+    tokenizer.save_pretrained(model_dir)
+    # DistilBERT like train_bert.py, with 2 small layers instead of 6 large ones
+    config = DistilBertConfig(vocab_size=len(vocab), dim=64, n_layers=2, n_heads=2,
+                              hidden_dim=128, max_position_embeddings=512, num_labels=2)
+    DistilBertForSequenceClassification(config).save_pretrained(model_dir)
+    bert_model.load_model(model_dir, engine="torch")
+    return bert_model
+
+
+BUILDERS = {
+    'BERT': build_bert,
+    'BiLSTM': build_bilstm,
+    'XGBoost': build_xgboost,
+}
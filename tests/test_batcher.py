@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from utils.batcher import MicroBatcher
+
+
+def start_batcher(batch_fn, max_batch_size=8, max_wait_ms=50):
+    batcher = MicroBatcher("test", batch_fn, max_batch_size, max_wait_ms)
+    batcher.start()
+    return batcher
+
+
+def test_concurrent_calls_share_a_batch():
+    batches = []
+
+    def batch_fn(messages):
+        batches.append(list(messages))
+        return [(1, len(message)) for message in messages]
+
+    batcher = start_batcher(batch_fn)
+    futures = [batcher.submit(message) for message in ("a", "bb", "ccc")]
+
+    assert [future.result(timeout=5) for future in futures] == [(1, 1), (1, 2), (1, 3)]
+    assert batches == [["a", "bb", "ccc"]]
+    assert batcher.stats()['messages'] == 3
+
+
+def test_batches_are_capped_at_max_batch_size():
+    sizes = []
+    release = threading.Event()
+
+    def batch_fn(messages):
+        release.wait(5)
+        sizes.append(len(messages))
+        return [(0, 0.5)] * len(messages)
+
+    batcher = start_batcher(batch_fn, max_batch_size=2)
+    futures = [batcher.submit(str(i)) for i in range(5)]
+    release.set()
+
+    for future in futures:
+        future.result(timeout=5)
+    assert max(sizes) <= 2
+    assert sum(sizes) == 5
+
+
+def test_a_failing_batch_is_retried_message_by_message():
+    def batch_fn(messages):
+        if "bad" in messages:
+            raise ValueError("bad input")
+        return [(0, 0.9) for _ in messages]
+
+    batcher = start_batcher(batch_fn)
+    good, bad = batcher.submit("good"), batcher.submit("bad")
+
+    assert good.result(timeout=5) == (0, 0.9)
+    with pytest.raises(ValueError, match="bad input"):
+        bad.result(timeout=5)
+
+
+def test_too_few_results_fail_every_caller():
+    batcher = start_batcher(lambda messages: [(0, 0.5)])
+    futures = [batcher.submit(message) for message in ("a", "b", "c")]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="1 results for 3 messages"):
+            future.result(timeout=5)
@@ -0,0 +1,28 @@
+from utils.bucketing import length_buckets
+
+
+def test_buckets_group_similar_lengths():
+    lengths = [100, 3, 4, 90, 5, 120]
+    buckets = length_buckets(lengths, max_batch_size=32, max_length_ratio=2.0)
+
+    assert buckets == [[1, 2, 4], [3, 0, 5]]
+
+
+def test_buckets_respect_max_batch_size():
+    buckets = length_buckets([10] * 7, max_batch_size=3)
+
+    assert [len(bucket) for bucket in buckets] == [3, 3, 1]
+
+
+def test_every_index_appears_exactly_once():
+    lengths = [7, 0, 250, 13, 13, 64, 1, 500, 33]
+    buckets = length_buckets(lengths, max_batch_size=4)
+
+    assert sorted(i for bucket in buckets for i in bucket) == list(range(len(lengths)))
+    for bucket in buckets:
+        shortest = max(1, min(lengths[i] for i in bucket))
+        assert max(lengths[i] for i in bucket) <= shortest * 2.0
+
+
+def test_empty_input():
+    assert length_buckets([]) == []
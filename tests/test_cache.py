@@ -0,0 +1,39 @@
+from utils.cache import InferenceCache, content_key
+
+
+def test_content_key_depends_on_message_and_versions():
+    key = content_key("hello", "v1:v2:v3:full")
+    assert key == content_key("hello", "v1:v2:v3:full")
+    assert key != content_key("hello!", "v1:v2:v3:full")
+    assert key != content_key("hello", "v1:v2:v4:full")
+
+
+def test_content_key_accepts_lone_surrogates():
+    assert content_key("\ud800", "v") != content_key("\ud801", "v")
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = InferenceCache(max_entries=2, ttl_s=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("utils.cache.time.monotonic", lambda: now[0])
+    cache = InferenceCache(max_entries=10, ttl_s=5)
+    cache.put("a", 1)
+    cache.put("b", 2, ttl_s=60)
+
+    now[0] += 10
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
@@ -0,0 +1,37 @@
+import base64
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from database.messages import InvalidCursor, decode_cursor, encode_cursor
+
+MESSAGE = SimpleNamespace(id=42, timestamp=datetime(2024, 5, 1, 12, 30, 15, 123456))
+
+
+def test_id_cursor_round_trip():
+    assert decode_cursor(encode_cursor(MESSAGE, 'id'), 'id') == (42,)
+
+
+def test_timestamp_cursor_round_trip():
+    cursor = encode_cursor(MESSAGE, 'timestamp')
+    assert decode_cursor(cursor, 'timestamp') == (MESSAGE.timestamp, 42)
+
+
+def test_cursors_are_url_safe():
+    cursor = encode_cursor(MESSAGE, 'timestamp')
+    assert all(c.isalnum() or c in "-_=" for c in cursor)
+
+
+@pytest.mark.parametrize("cursor, order", [
+    ("not base64!", 'id'),
+    (base64.urlsafe_b64encode(b"not json").decode(), 'id'),
+    (base64.urlsafe_b64encode(b'["x"]').decode(), 'id'),
+    (base64.urlsafe_b64encode(b"[1, 2]").decode(), 'id'),
+    (base64.urlsafe_b64encode(b"[1]").decode(), 'timestamp'),
+    (base64.urlsafe_b64encode(b'["yesterday", 1]').decode(), 'timestamp'),
+    (base64.urlsafe_b64encode(b"null").decode(), 'id'),
+])
+def test_malformed_cursors_raise_invalid_cursor(cursor, order):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, order)
@@ -0,0 +1,65 @@
+import pytest
+
+from utils import long_input
+from utils.long_input import aggregate, chunks, clip
+
+
+def test_clip_ends_at_a_space():
+    assert clip("short", 10) == "short"
+    assert clip("hello wonderful world", 18) == "hello wonderful"
+    # A space in the first half would drop too much text
+    assert clip("hello wonderful world", 12) == "hello wonder"
+    assert clip("x" * 30, 10) == "x" * 10  # no space to end at
+
+
+def test_chunks_cover_the_start_and_the_end():
+    message = " ".join(f"w{i:04d}" for i in range(2000))
+    parts = chunks(message, chunk_chars=500, max_chunks=4)
+
+    assert len(parts) == 4
+    assert all(len(part) <= 500 for part in parts)
+    assert message.startswith(parts[0])
+    assert parts[-1].rstrip().endswith("w1999")
+
+
+def test_short_messages_are_a_single_chunk():
+    assert chunks("a" * 300, chunk_chars=500, max_chunks=4) == ["a" * 300]
+
+
+def test_chunk_count_follows_the_length():
+    assert len(chunks("a" * 1200, chunk_chars=500, max_chunks=4)) == 3
+
+
+def test_aggregate_max_takes_the_highest_fraud_probability(monkeypatch):
+    monkeypatch.setattr(long_input, "LONG_INPUT_AGGREGATE", "max")
+    assert aggregate([(0, 0.9), (1, 0.8), (0, 0.6)]) == (1, pytest.approx(0.8))
+
+
+def test_aggregate_mean_averages_fraud_probabilities(monkeypatch):
+    monkeypatch.setattr(long_input, "LONG_INPUT_AGGREGATE", "mean")
+    # Fraud probabilities 0.1, 0.8 and 0.3
+    assert aggregate([(0, 0.9), (1, 0.8), (0, 0.7)]) == (0, pytest.approx(0.6))
+
+
+def test_single_results_pass_through():
+    assert aggregate([(1, 0.7)]) == (1, 0.7)
+
+
+def test_chunks_of_a_batch_go_to_the_model_in_one_call(monkeypatch):
+    monkeypatch.setattr(long_input, "LONG_INPUT_POLICY", "chunk")
+    monkeypatch.setattr(long_input, "LONG_INPUT_MAX_CHARS", 100)
+    monkeypatch.setattr(long_input, "LONG_INPUT_AGGREGATE", "max")
+    calls = []
+
+    def analyze_messages(messages):
+        calls.append(messages)
+        return [(1, 0.9) if "scam" in message else (0, 0.8) for message in messages]
+
+    long_message = "word " * 600 + "scam"
+    results = long_input.analyze_long_messages(analyze_messages, ["short", long_message])
+
+    assert len(calls) == 1
+    assert calls[0][0] == "short"
+    assert results == [(0, 0.8), (1, pytest.approx(0.9))]
+    assert long_input.report("short") is None
+    assert long_input.report(long_message)['chunks'] == len(calls[0]) - 1
@@ -0,0 +1,34 @@
+from multiprocessing import shared_memory
+
+import pytest
+
+from models.process_pool import (read_messages, read_results, write_messages,
+                                 write_results)
+
+
+@pytest.fixture
+def buffer():
+    shm = shared_memory.SharedMemory(create=True, size=1 << 16)
+    yield shm.buf
+    shm.close()
+    shm.unlink()
+
+
+def test_messages_round_trip(buffer):
+    messages = ["hello", "", "Ünïcödé 🙂", "\ud800 lone surrogate", "x" * 1000]
+
+    assert write_messages(buffer, messages)
+    assert read_messages(buffer, len(messages)) == messages
+
+
+def test_messages_that_do_not_fit_are_refused(buffer):
+    assert not write_messages(buffer, ["x" * (1 << 16)])
+    assert not write_messages(buffer, [""] * 8000)  # no room for the results
+
+
+def test_results_round_trip(buffer):
+    results = [(0, 0.25), (1, 0.875), (1, 1.0)]
+    write_messages(buffer, ["a", "b", "c"])
+
+    write_results(buffer, results)
+    assert read_results(buffer, len(results)) == results
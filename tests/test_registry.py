@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from models import registry
+
+
+@pytest.fixture(autouse=True)
+def temporary_registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(registry, "registry_dir", lambda: str(tmp_path))
+
+
+def publish_version(name="XGBoost", content="model", activate=True):
+    version, paths = registry.stage_version(name)
+    with open(paths['model_path'], "w") as f:
+        f.write(content)
+    return registry.publish(name, version, {'source': 'test'}, activate=activate)
+
+
+def test_publish_makes_the_version_current():
+    version = publish_version()
+
+    assert registry.current_version("XGBoost") == version
+    entry, = registry.list_versions("XGBoost")
+    assert entry['version'] == version
+    assert entry['current'] is True
+    assert entry['source'] == 'test'
+    assert entry['parent'] is None
+    served, paths = registry.artifact_paths("XGBoost")
+    assert served == version
+    with open(paths['model_path']) as f:
+        assert f.read() == "model"
+
+
+def test_publish_without_activation_keeps_the_current_version():
+    first = publish_version()
+    second = publish_version(activate=False)
+
+    assert registry.current_version("XGBoost") == first
+    assert [entry['version'] for entry in registry.list_versions("XGBoost")] == [first, second]
+
+
+def test_previous_version_and_rollback():
+    first = publish_version()
+    second = publish_version()
+    assert registry.list_versions("XGBoost")[1]['parent'] == first
+    assert registry.previous_version("XGBoost") == first
+
+    registry.set_current("XGBoost", first)
+    assert registry.current_version("XGBoost") == first
+    assert registry.previous_version("XGBoost") is None
+    assert not any(name.endswith(".tmp") for name in os.listdir(registry.model_dir("XGBoost")))
+    assert second in [entry['version'] for entry in registry.list_versions("XGBoost")]
+
+
+def test_unknown_versions_are_rejected():
+    publish_version()
+    with pytest.raises(registry.UnknownVersion):
+        registry.set_current("XGBoost", "20000101T000000Z-000000")
+    with pytest.raises(registry.UnknownVersion):
+        registry.artifact_paths("XGBoost", "20000101T000000Z-000000")
+
+
+def test_without_versions_the_legacy_paths_are_served():
+    version, paths = registry.artifact_paths("BERT")
+    assert version is None
+    assert paths == registry.legacy_paths("BERT")
+
+
+def test_prune_keeps_the_newest_versions_and_the_current_one():
+    versions = [publish_version() for _ in range(4)]
+    registry.set_current("XGBoost", versions[0])
+
+    registry.prune("XGBoost", keep=2)
+
+    remaining = [entry['version'] for entry in registry.list_versions("XGBoost")]
+    assert remaining == [versions[0], versions[2], versions[3]]
+
+
+def test_staged_versions_are_not_listed():
+    version, _ = registry.stage_version("XGBoost")
+    assert registry.list_versions("XGBoost") == []
+    registry.discard("XGBoost", version)
+    assert not os.path.exists(registry.staging_dir("XGBoost", version))
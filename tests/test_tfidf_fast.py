@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from models.tfidf_fast import CharNgramTfidf
+
+CORPUS = [
+    "Your account has been suspended, verify your details now!",
+    "See you at lunch tomorrow",
+    "You have WON a prize: click the link to claim it",
+    "the meeting moved to three, thanks for the slides",
+    "Send your PIN to 0800-123-456 urgently",
+]
+UNSEEN = [
+    "Claim your prize now",
+    "   lots   of   spaces   ",
+    "",
+    "Ünïcödé wörds and émojis 🙂",
+    "a",
+]
+
+
+@pytest.mark.parametrize("options", [
+    {'ngram_range': (2, 4)},
+    {'ngram_range': (1, 3), 'sublinear_tf': True},
+    {'ngram_range': (3, 5), 'binary': True, 'norm': 'l1'},
+    {'ngram_range': (2, 3), 'use_idf': False, 'lowercase': False},
+])
+def test_transform_matches_sklearn(options):
+    tfidf = TfidfVectorizer(analyzer="char_wb", **options).fit(CORPUS)
+    fast = CharNgramTfidf.from_vectorizer(tfidf)
+
+    texts = CORPUS + UNSEEN
+    expected = tfidf.transform(texts).toarray()
+    np.testing.assert_allclose(fast.transform(texts).toarray(), expected, atol=1e-12)
+
+
+def test_saved_arrays_load_to_the_same_transform(tmp_path):
+    tfidf = TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4)).fit(CORPUS)
+    fast = CharNgramTfidf.from_vectorizer(tfidf)
+    settings = fast.save_arrays(str(tmp_path))
+    loaded = CharNgramTfidf.load_arrays(str(tmp_path), settings)
+
+    np.testing.assert_allclose(loaded.transform(UNSEEN).toarray(),
+                               fast.transform(UNSEEN).toarray())
+
+
+def test_unsupported_vectorizers_are_rejected():
+    tfidf = TfidfVectorizer(analyzer="word").fit(CORPUS)
+    with pytest.raises(ValueError):
+        CharNgramTfidf.from_vectorizer(tfidf)
@@ -0,0 +1,34 @@
+import pytest
+
+from api.routes import parse_verifications
+from utils.config import VERIFY_MAX_MESSAGES
+
+
+def test_ids_and_labelled_items():
+    items = [1, {'id': 2, 'label': 1}, {'id': 3, 'label': 0}, {'id': 4}]
+    assert parse_verifications(items) == {1: None, 2: 1, 3: 0, 4: None}
+
+
+def test_repeated_ids_with_the_same_label_are_merged():
+    assert parse_verifications([5, 5, {'id': 6, 'label': 1}, {'id': 6, 'label': 1}]) == {5: None, 6: 1}
+
+
+@pytest.mark.parametrize("items, error", [
+    (None, 'No messages provided'),
+    ([], 'No messages provided'),
+    ({'id': 1}, 'No messages provided'),
+    (["1"], 'Message ids must be integers'),
+    ([True], 'Message ids must be integers'),
+    ([{'label': 1}], 'Message ids must be integers'),
+    ([{'id': 1, 'label': 2}], 'Labels must be 0'),
+    ([{'id': 1, 'label': True}], 'Labels must be 0'),
+    ([{'id': 1, 'label': 0}, {'id': 1, 'label': 1}], 'Conflicting labels for message 1'),
+])
+def test_invalid_requests(items, error):
+    with pytest.raises(ValueError, match=error):
+        parse_verifications(items)
+
+
+def test_request_size_is_limited():
+    with pytest.raises(ValueError, match=f"At most {VERIFY_MAX_MESSAGES}"):
+        parse_verifications(list(range(VERIFY_MAX_MESSAGES + 1)))